@@ -1,34 +1,81 @@
+import hashlib
 import json
+import logging
 import os
+import tempfile
 import time
-from threading import Thread
-from typing import Callable, Dict, Any
-
-import websocket
-from bs4 import BeautifulSoup as bs
-from .common import apihelper, converters, exceptions, enums, events
+from contextlib import nullcontext
+from datetime import datetime
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, Any, Iterable, Iterator, List
+
+from .common import apihelper, converters, decoder, exceptions, enums, events
+from .common.cache import ProfileCache
+from .common.client import HTTPClient
+from .common.dedup import EventDeduplicator
+from .common.dispatcher import Dispatcher
+from .common.journal import EventJournal
+from .common.mirror import ChatMirror
+from .common.orders import OrderStore
+from .common.pagination import Watermark, iter_items, iter_numbered_pages, iter_pages
 from .common.enums import EventTypes
+from .common.ratelimit import RateLimiter
+from .common.reconnect import Backoff, Recovery
+from .common.replay import ReplayReport, read_frames, stubbed_api
+from .common.routing import MessageRouter
+from .common.tokens import TokenManager
 from .types import API_Methods, UserProfile, Blacklist, Message, Image, ImageMeta, SelfUserProfile, Order, Notification, \
-    NotificationWidget, UserReviews, GameServer, OffersGame
+    NotificationWidget, Review, UserReviews, GameServer, OffersGame, MessageList
+
+logger = logging.getLogger("PaygameAPI")
+
 
 class Handler:
-    def __init__(self, handler, func, **fillers):
+    def __init__(self, handler, func, text: str = None, text_contains: str = None, name: str = None, **fillers):
         self.handler = handler
         self.func = func
+        # Имя обработчика в журнале событий, должно совпадать между перезапусками
+        self.name = name or f"{handler.__module__}.{handler.__qualname__}"
+        # Текстовые фильтры хранятся в нижнем регистре, по ним строится индекс MessageRouter
+        self.text = text.lower() if text is not None else None
+        self.text_contains = text_contains.lower() if text_contains is not None else None
         self.filters: Dict[str, Callable] = fillers
 
-    def test(self, event):
-        return (not self.func or self.func(event)) and all(f(event) for _, f in self.filters.items())
+    def test_text(self, event) -> bool:
+        if self.text is None and self.text_contains is None:
+            return True
+        text = event.message.text.lower()
+        return (self.text is None or text == self.text) and (self.text_contains is None or self.text_contains in text)
 
-    def run(self, event):
-        if self.test(event):
+    def test(self, event, routed: bool = False):
+        """
+        :param routed: текстовые фильтры уже проверены индексом
+        """
+        return ((routed or self.test_text(event)) and (not self.func or self.func(event))
+                and all(f(event) for _, f in self.filters.items()))
+
+    def run(self, event, routed: bool = False):
+        if self.test(event, routed):
             return self.handler(event)
 
 
 class Bot:
     def __init__(self, token: str, requests_timeout: int | float = 10, user_agent: str = None,
-                 reconnect_socket: bool = False):
-        self.token_path = os.path.join(os.path.abspath(__file__), "..", "token.json")
+                 reconnect_socket: bool = False, rate_limiter: RateLimiter = None, client: HTTPClient = None,
+                 dispatcher: Dispatcher = None, deduplicator: EventDeduplicator = None, journal: EventJournal = None,
+                 preload_me: bool = False, warm_start: bool = False, token_path: str = None,
+                 state_interval: float = 5, max_state_age: float = 600,
+                 profile_cache: ProfileCache = None, chat_mirror: ChatMirror = None, order_store: OrderStore = None):
+        # Файл снимка состояния бота (см. save_state/restore_state)
+        self.token_path = os.path.abspath(token_path or "token.json")
+        self.warm_start = warm_start
+        # С warm_start снимок обновляется во время работы не чаще, чем раз в state_interval секунд
+        self.state_interval = state_interval
+        # Позиция в канале из снимка старше max_state_age секунд не восстанавливается
+        self.max_state_age = max_state_age
+        self._state_saved_at = 0.0
+        self._state_lock = Lock()  # save_state вызывается из потока диспетчера, stop и пользовательского кода
 
         self.headers = {
             'User-Agent': user_agent or 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36',
@@ -41,7 +88,32 @@ class Bot:
         self.token = token
 
         self.requests_timeout = requests_timeout
-        self.me = self.get_me()
+        # У каждого бота свой пул соединений и свои куки, если клиент не передан явно
+        self.client = client or HTTPClient(limiter=rate_limiter)
+        self.rate_limiter = rate_limiter or self.client.limiter
+        # Общие для всех запросов бота аргументы apihelper._make_request
+        self._request_kwargs = {"client": self.client, "limiter": self.rate_limiter, "timeout": requests_timeout}
+        self.token_manager = TokenManager(token, request_kwargs=self._request_kwargs)
+        # Профили пользователей из ответов API и событий, get_user отдает их без запроса, пока не истекли
+        self.profile_cache = profile_cache or ProfileCache()
+        # Локальная копия списка чатов, обновляемая событиями вебсокета
+        self.chat_mirror = chat_mirror
+        # Локальное хранилище заказов, статусы обновляются событиями вебсокета
+        self.order_store = order_store
+        # Локальные копии данных, которые получают события независимо от обработчиков
+        self._observers: Dict[str, List[Callable]] = {}
+        if chat_mirror is not None:
+            for event_type in (EventTypes.NEW_MESSAGE, EventTypes.CHAT_READ):
+                self._observers.setdefault(event_type, []).append(chat_mirror.apply)
+        if order_store is not None:
+            for event_type in (EventTypes.NEW_ORDER, EventTypes.ORDER_STATE):
+                self._observers.setdefault(event_type, []).append(order_store.apply)
+        # Профиль аккаунта загружается при первом обращении к Bot.me (или в фоне, если preload_me)
+        self._me: SelfUserProfile | None = None
+        self._me_data: Dict[str, Any] | None = None  # JSON профиля, из которого построен me
+        self._me_lock = Lock()
+        if preload_me:
+            Thread(target=self._preload_me, name="PaygameAPI-me", daemon=True).start()
 
         self.reconnect_socket = reconnect_socket
 
@@ -53,6 +125,8 @@ class Bot:
             EventTypes.ORDER_STATE: [],
             EventTypes.NOTIFICATION: [],
         }
+        # Индекс текстовых фильтров обработчиков сообщений
+        self._message_router = MessageRouter()
 
         self.__event_map = {
             EventTypes.CLIENT_CONNECTION: events.ClientConnectionEvent,
@@ -65,36 +139,106 @@ class Bot:
 
         self.__ws_error_handlers = []
 
+        # Обработчики выполняются в пуле потоков, чтобы не блокировать поток вебсокета
+        self.dispatcher = dispatcher or Dispatcher()
+        # Отсеивание повторно доставленных событий (по умолчанию выключено)
+        self.deduplicator = deduplicator
+        # Журнал событий: неподтвержденные обработчиками события обрабатываются повторно после перезапуска
+        self.journal = journal
+
         self.first_msg = False  # Флаг, устанавливается на True, после получения первого сообщения
         self.channel: str | None = None  # Приватный канал, по которому будут идти запросы
 
-    def _refresh_token(self) -> bool:
-        self.token = apihelper._refresh_token(self.token)
-        return self.token
+        self.backoff = Backoff()  # Задержки между переподключениями к вебсокету
+        self.recovery = Recovery()  # Смещение в канале для восстановления пропущенных событий
+        self._stop_event = Event()
+        self._connected = Event()  # Устанавливается после подключения к приватному каналу вебсокета
+        self._ws_thread: Thread | None = None
+
+        if warm_start:
+            self.restore_state()
+
+    def _refresh_token(self) -> str:
+        return self.token_manager.refresh()
 
-    def get_user(self, username: str = None, user_id: int = None) -> UserProfile | SelfUserProfile:
+    def get_user(self, username: str = None, user_id: int = None, use_cache: bool = True) -> UserProfile | SelfUserProfile:
         """
         Возвращает объект пользователя
         Должен присутствовать либо Username, либо ID (ID имеет больший вес, если переданы оба аргумента, username будет проигнорирован)
 
         :param username: ник пользователя
         :param user_id: идентификатор пользователя
+        :param use_cache: вернуть профиль из кэша, если он там есть и не устарел
 
         :return: Экземпляр UserProfile, если профиль не текущего аккаунта, иначе SelfUserProfile
         """
-        user_data = apihelper.get_user_info(self.token, username, user_id)
-        return converters.parse_user_profile(user_data.json())
+        if use_cache:
+            profile = self.profile_cache.get(user_id, username)
+            if profile is not None:
+                return profile
+        user_data = apihelper.get_user_info(self.token_manager, username, user_id, **self._request_kwargs)
+        return self.profile_cache.put(converters.parse_user_profile(user_data.json()))
+
+    @property
+    def me(self) -> SelfUserProfile:
+        """
+        Профиль текущего аккаунта. Загружается один раз при первом обращении.
+        """
+        me = self._me
+        if me is None:
+            with self._me_lock:
+                if self._me is None:
+                    self._me = self.get_me()
+                me = self._me
+        return me
+
+    @me.setter
+    def me(self, value: SelfUserProfile):
+        self._me = value
+
+    def _preload_me(self):
+        try:
+            self.me
+        except Exception:
+            logger.exception("Не удалось загрузить профиль аккаунта")
 
     def get_me(self) -> SelfUserProfile:
-        response = apihelper.get_me(API_Methods.base_url, self.headers, self.token)
+        """
+        Получает профиль текущего аккаунта
+        """
+        try:
+            data = apihelper.get_user_data(self.token_manager, **self._request_kwargs).json()
+        except exceptions.UnauthorizedError:
+            raise
+        except (exceptions.RequestFailedError, ValueError):
+            data = {}
+        if "email" in data:
+            try:
+                me = converters.parse_user_profile(data)
+                self._me_data = data
+                return self.profile_cache.put(me)
+            except KeyError:
+                pass
+        username = data.get("username") or self._scrape_username()
+        data = apihelper.get_user_info(self.token_manager, username, **self._request_kwargs).json()
+        self._me_data = data
+        return self.profile_cache.put(converters.parse_user_profile(data))
+
+    def _scrape_username(self) -> str:
+        """
+        Ник текущего аккаунта со страницы сайта. Используется, только если API не вернуло данные пользователя.
+        """
+        from bs4 import BeautifulSoup as bs
+
+        response = apihelper.get_me(API_Methods.base_url, self.headers, self.token, **self._request_kwargs)
         name_elem = bs(response.text, "html.parser").find("span", class_="sc-1qhtcg6-2 dBWgoR")
         if not name_elem:
             raise exceptions.RequestFailedError(response)
-        name = name_elem.text
-        return self.get_user(name)
+        return name_elem.text
 
     def online_users(self):
-        response = apihelper._make_request("get", API_Methods.online_users, self.headers, token=self.token)
+        response = apihelper._make_request("get", API_Methods.online_users, self.headers, token=self.token_manager,
+                                           **self._request_kwargs)
         return response.json()
 
     def create_offer(self, game_id: int, offer_type: int, price: int, quantity: int, description: str, title: str,
@@ -132,7 +276,7 @@ class Bot:
             } for i, text in enumerate(auto_delivery, start=1)]
 
         response = apihelper._make_request("post", API_Methods.create_offer, payload=payload,
-                                           token=self.token)
+                                           token=self.token_manager, **self._request_kwargs)
         return response.json().get('id')
 
     def read_notifications(self):
@@ -141,18 +285,30 @@ class Bot:
 
         :return:
         """
-        resp = apihelper.mark_all_as_read(self.token)
+        resp = apihelper.mark_all_as_read(self.token_manager, **self._request_kwargs)
         return not any(e in resp.json() for e in ["error", "errors"])
 
-    def get_order(self, order_id: str) -> Order:
+    def get_order(self, order_id: str, use_store: bool = True) -> Order:
         """
         Получает заказ по айди
 
         :param order_id: идентификатор заказа
+        :param use_store: вернуть заказ из хранилища заказов, если оно подключено и заказ уже загружен.
+            При False заказ запрашивается заново и обновляется в хранилище
         :return: Экземпляр Order
         """
-        response = apihelper.get_order(self.token, order_id)
-        return converters.parse_order(response.json())
+        if self.order_store is None:
+            return self._fetch_order(order_id)
+        if use_store:
+            return self.order_store.get(order_id, self._fetch_order)
+        return self.order_store.put(self._fetch_order(order_id))
+
+    def _fetch_order(self, order_id: str) -> Order:
+        response = apihelper.get_order(self.token_manager, order_id, **self._request_kwargs)
+        order = converters.parse_order(response.json())
+        self.profile_cache.put(order.customer, full=False)
+        self.profile_cache.put(order.seller, full=False)
+        return order
 
     def send_message(self, chat_id: int, message: str = None, image: str = None) -> Message:
         """
@@ -169,7 +325,7 @@ class Bot:
             raise exceptions.IncorrectRequest("Нельзя отправить пустое сообщение")
         if isinstance(image, bytes):
             image = self.upload_image(image)
-        response = apihelper.send_message(self.token, chat_id, message, image)
+        response = apihelper.send_message(self.token_manager, chat_id, message, image, **self._request_kwargs)
         return converters.parse_message(response.json())
 
     def reply_to_review(self, review_id: int, text: str, edit: bool = False, return_obj: bool = False):
@@ -183,7 +339,7 @@ class Bot:
 
         :return True если успешно, иначе False
         """
-        resp = apihelper.reply_to_review(self.token, review_id, text, edit)
+        resp = apihelper.reply_to_review(self.token_manager, review_id, text, edit, **self._request_kwargs)
         if return_obj:
             return converters.parse_review(resp.json())
         else:
@@ -196,7 +352,7 @@ class Bot:
         :param image: байтовые данные изображения
         :return: Экземпляр Image
         """
-        response = apihelper.upload_image(self.token, image)
+        response = apihelper.upload_image(self.token_manager, image, **self._request_kwargs)
         if (json := response.json()).get("id"):
             return converters.parse_image(json)
 
@@ -208,17 +364,75 @@ class Bot:
 
         :return: Экземляр Chat
         """
-        response = apihelper.get_chat_messages(self.token, chat_id, page_size)
+        response = apihelper.get_chat_messages(self.token_manager, chat_id, page_size, **self._request_kwargs)
         return converters.parse_chat_messages(response.json())
 
+    def get_chat_history(self, chat_id: int, page_size: int = 50, cursor: str = None) -> MessageList:
+        """
+        Получает страницу сообщений чата
+
+        :param chat_id: ID чата
+        :param page_size: кол-во сообщений на 1 странице
+        :param cursor: курсор страницы (None - последние сообщения)
+
+        :return: Экземпляр MessageList
+        """
+        response = apihelper.get_chat_messages(self.token_manager, chat_id, page_size, cursor, **self._request_kwargs)
+        return converters.parse_message_list(response.json())
+
+    def iter_chat_messages(self, chat_id: int, page_size: int = 50, cursor: str = None, forward: bool = False,
+                           until: int | Callable[[Message], bool] = None) -> Iterator[Message]:
+        """
+        Проходит историю чата постранично, не загружая ее целиком.
+        Следующая страница запрашивается в фоне, пока обрабатывается текущая.
+
+        По умолчанию сообщения идут от новых к старым, начиная с последнего (или со страницы cursor).
+        С forward=True сообщения идут от старых к новым по previous_cursor, начиная со страницы cursor
+        (например, сохраненного ранее курсора страницы :class:`MessageList`).
+
+        :param chat_id: ID чата
+        :param page_size: кол-во сообщений на 1 странице
+        :param cursor: курсор страницы, с которой начать
+        :param forward: идти от старых сообщений к новым
+        :param until: ID сообщения, на котором остановиться (при обходе от новых к старым - на первом сообщении
+            с ID не больше until, от старых к новым - не меньше), или функция, возвращающая True для сообщения,
+            на котором нужно остановиться. Само сообщение не возвращается
+
+        :return: генератор экземпляров Message
+        """
+        if until is None or callable(until):
+            stop = until
+        elif forward:
+            stop = lambda message: message.id >= until
+        else:
+            stop = lambda message: message.id <= until
+        next_cursor = (lambda page: page.previous_cursor) if forward else (lambda page: page.next_cursor)
+        pages = iter_pages(lambda c: self.get_chat_history(chat_id, page_size, c), cursor, next_cursor=next_cursor,
+                           last=(lambda page: any(stop(message) for message in page.results)) if stop else None)
+        # Страница содержит сообщения от старых к новым
+        return iter_items(pages, stop, reverse=not forward)
+
     def get_chats(self):
         """
         Получает все чаты
 
         :return: Экземпляр ChatList
         """
-        response = apihelper.get_messager(self.token)
-        return converters.parse_chat_list(response.json())
+        response = apihelper.get_messager(self.token_manager, **self._request_kwargs)
+        data = response.json()
+        if self.chat_mirror is not None:
+            if self.chat_mirror.me_id is None:
+                # Без ID аккаунта собственные последние сообщения сделали бы чаты непрочитанными
+                try:
+                    self.chat_mirror.me_id = self.me.id
+                except Exception:
+                    logger.exception("Не удалось загрузить профиль аккаунта для копии чатов")
+            self.chat_mirror.seed(data)
+        chats = converters.parse_chat_list(data)
+        for chat in chats.results:
+            for user in chat.users:
+                self.profile_cache.put(user, full=False)
+        return chats
 
     def read_messages(self, chat: int):
         """
@@ -226,7 +440,7 @@ class Bot:
         :param chat: ID чата
         :return: True если успешно, иначе False
         """
-        resp = apihelper.read_messages(self.token, chat)
+        resp = apihelper.read_messages(self.token_manager, chat, **self._request_kwargs)
         return not any(e in resp.json() for e in ["error", "errors"])
 
     def get_latest_notifications(self) -> NotificationWidget:
@@ -235,7 +449,7 @@ class Bot:
 
         :return: Экземпляр NotificationWidget
         """
-        response = apihelper.get_latest_notifications(self.token)
+        response = apihelper.get_latest_notifications(self.token_manager, **self._request_kwargs)
         notifications = converters.parse_notification_widget(response.json())
         return notifications
 
@@ -249,9 +463,29 @@ class Bot:
 
         :return: Экземпляр NotificationList
         """
-        response = apihelper.get_all_notifications(self.token, page_size, verb, cursor)
+        response = apihelper.get_all_notifications(self.token_manager, page_size, verb, cursor, **self._request_kwargs)
         return converters.parse_notification_list(response.json())
 
+    def iter_notifications(self, verb: enums.NotificationTypes = None, since: datetime | str = None,
+                           page_size: int = 50, cursor: str = None) -> Iterator[Notification]:
+        """
+        Проходит все уведомления от новых к старым, следуя по next_cursor.
+        Следующая страница запрашивается в фоне, пока обрабатывается текущая.
+
+        :param verb: Тип уведомления (получить только определенные)
+        :param since: граница для инкрементальной синхронизации: datetime - остановиться на уведомлениях,
+            созданных не позже этого момента; строка - остановиться на уведомлении с этим uuid_id
+            (само уведомление не возвращается)
+        :param page_size: кол-во уведомлений на 1 странице
+        :param cursor: курсор страницы, с которой начать
+
+        :return: генератор экземпляров Notification
+        """
+        watermark = Watermark(since) if since is not None else None
+        pages = iter_pages(lambda c: self.get_notifications(page_size, verb, c), cursor,
+                           last=watermark.page_reached if watermark else None)
+        return iter_items(pages, watermark.reached if watermark else None)
+
     def get_reviews(self, username: str, page: int = 1) -> UserReviews:
         """
         Получает отзывы пользователя
@@ -261,8 +495,36 @@ class Bot:
 
         :return: экзепляр UserReviews
         """
-        response = apihelper.get_reviews(self.token, username, page)
-        return converters.parse_rewiews(response.json())
+        response = apihelper.get_reviews(self.token_manager, username, page, **self._request_kwargs)
+        reviews = converters.parse_rewiews(response.json())
+        for review in reviews.results:
+            self.profile_cache.put(review.seller, full=False)
+            self.profile_cache.put(review.author, full=False)
+        return reviews
+
+    def iter_reviews(self, username: str, concurrency: int = 4) -> Iterator[Review]:
+        """
+        Проходит все отзывы пользователя по порядку страниц.
+        После первой страницы известен номер последней, и остальные страницы запрашиваются параллельно.
+
+        :param username: Юзернейм пользователя
+        :param concurrency: максимальное количество одновременных запросов
+
+        :return: генератор экземпляров Review
+        """
+        for page in iter_numbered_pages(lambda number: self.get_reviews(username, number), concurrency=concurrency):
+            yield from page.results
+
+    def get_all_reviews(self, username: str, concurrency: int = 4) -> List[Review]:
+        """
+        Получает все отзывы пользователя (см. :meth:`iter_reviews`)
+
+        :param username: Юзернейм пользователя
+        :param concurrency: максимальное количество одновременных запросов
+
+        :return: список экземпляров Review
+        """
+        return list(self.iter_reviews(username, concurrency))
 
     def change_settings(self, em_not=True, tg_ap=True, tg_not=True, brwsr_not=False, tg_wio=False) -> SelfUserProfile:
         """
@@ -283,7 +545,7 @@ class Bot:
             "brwsr_not": brwsr_not,
             "tg_wio": tg_wio
         }
-        response = apihelper.change_data(self.token, **payload)
+        response = apihelper.change_data(self.token_manager, **payload, **self._request_kwargs)
         return converters.parse_user_profile(response.json())
 
     # незавершенные методы
@@ -357,9 +619,14 @@ class Bot:
 
     def _register_handler(self, func: Callable = None, event_type: str = None, **filters):
         def wrapper(handler: Callable):
+            name = f"{event_type}:{handler.__module__}.{handler.__qualname__}"
+            if any(h.name == name for h in self.__handlers[event_type]):
+                name = f"{name}#{len(self.__handlers[event_type])}"
             self.__handlers[event_type].append(
-                Handler(handler, func, **filters)
+                Handler(handler, func, name=name, **filters)
             )
+            if event_type == EventTypes.NEW_MESSAGE:
+                self._message_router.rebuild(self.__handlers[EventTypes.NEW_MESSAGE])
         return wrapper
 
     def ws_error_handler(self):
@@ -377,8 +644,8 @@ class Bot:
         :param text_contains: Текст, с учетом вхождения
         """
         filters = {}
-        if text: filters['text'] = lambda e: e.message.text.lower() == text.lower()
-        if text_contains: filters['text_contains'] = lambda e: e.message.text.lower() in text_contains.lower()
+        if text: filters['text'] = text
+        if text_contains: filters['text_contains'] = text_contains
         return self._register_handler(func, EventTypes.NEW_MESSAGE, **filters)
 
     def order_handler(self, func: Callable = None):
@@ -405,12 +672,102 @@ class Bot:
         """
         return self._register_handler(func, EventTypes.CHAT_READ)
 
-    def _handle_event(self, event: events.BaseEvent):
+    def _event_handlers(self, event_type: str) -> list:
         """
-        Обрабатывает событие
+        Обработчики события. Оплаченный заказ сначала получают обработчики новых заказов,
+        затем обработчики изменения заказов.
         """
-        for handler in self.__handlers[event.event_type]:
-            handler.run(event)
+        if event_type == EventTypes.NEW_ORDER:
+            return self.__handlers[EventTypes.NEW_ORDER] + self.__handlers[EventTypes.ORDER_STATE]
+        return self.__handlers.get(event_type, [])
+
+    def _handle_event(self, event: events.BaseEvent, event_type: str = None, seq: int = None,
+                      names: List[str] = None):
+        """
+        Передает событие в пул обработчиков
+
+        :param seq: номер записи в журнале событий
+        :param names: имена обработчиков, которые должны подтвердить запись
+        """
+        event_type = event_type or event.event_type
+        if not self._event_handlers(event_type):
+            if seq is not None:
+                self.journal.ack(seq, *names)
+            return
+        # Схлопнутое событие не было бы подтверждено, поэтому с журналом события не схлопываются
+        coalesce_key = None if self.journal else self._coalesce_key(event, event_type)
+        self.dispatcher.submit(self._run_handlers, event, event_type, seq, names, key=event.partition_key,
+                               coalesce_key=coalesce_key)
+
+    def _run_handlers(self, event: events.BaseEvent, event_type: str = None, seq: int = None,
+                      names: List[str] = None):
+        """
+        Выполняет обработчики события. Если событие записано в журнал, каждый обработчик
+        подтверждает запись после выполнения. Обработчик, завершившийся ошибкой, повторяется
+        journal.retries раз, после чего запись передается в файл необработанных событий журнала.
+        """
+        event_type = event_type or event.event_type
+        if event_type == EventTypes.NEW_MESSAGE:
+            # Отправитель сообщения - частичный профиль, он обновляет сохраненный в кэше
+            self.profile_cache.put(event.message.sender, full=False)
+            # Подходящие по тексту обработчики берутся из индекса, без проверки каждого фильтра
+            handlers, routed = self._message_router.match(event.message.text), True
+        else:
+            handlers, routed = self._event_handlers(event_type), False
+        ran = set()
+        for handler in handlers:
+            if names is not None and handler.name not in names:
+                continue
+            if seq is None:
+                handler.run(event, routed)
+            else:
+                self._run_journaled(handler, event, routed, seq)
+                ran.add(handler.name)
+        if seq is not None:
+            # Обработчики, не подобранные индексом или удаленные с прошлого запуска
+            self.journal.ack(seq, *(name for name in names if name not in ran))
+
+    def _run_journaled(self, handler: Handler, event: events.BaseEvent, routed: bool, seq: int):
+        delay = self.journal.retry_delay
+        for attempt in range(self.journal.retries + 1):
+            try:
+                handler.run(event, routed)
+            except Exception as e:
+                if attempt == self.journal.retries:
+                    logger.exception("Ошибка в обработчике %s, событие передано в файл необработанных событий",
+                                     handler.name)
+                    self.journal.fail(seq, handler.name, e)
+                    return
+                logger.warning("Ошибка в обработчике %s, повтор через %.1f с", handler.name, delay, exc_info=True)
+                if self._stop_event.wait(delay):
+                    return  # Бот остановлен: запись останется неподтвержденной и будет обработана после перезапуска
+                delay *= 2
+            else:
+                self.journal.ack(seq, handler.name)
+                return
+
+    def _replay_journal(self):
+        """
+        Повторно передает обработчикам события, не подтвержденные до прошлой остановки.
+        """
+        for seq, message, names in self.journal.pending():
+            frame = decoder.decode(message)
+            event = self.__event_map.get(frame.type, events.BaseEvent).from_frame(frame)
+            self._handle_event(event, frame.type, seq, names)
+
+    @staticmethod
+    def _coalesce_key(event: events.BaseEvent, event_type: str = None):
+        """
+        Ключ, по которому события в переполненной очереди могут заменять друг друга.
+        Новое прочтение чата или новый статус заказа делают предыдущее такое событие неактуальным,
+        сообщения и новые заказы не схлопываются никогда.
+        """
+        event_type = event_type or event.event_type
+        if event_type == EventTypes.CHAT_READ:
+            return event_type, event.conversation_id
+        if event_type == EventTypes.ORDER_STATE:
+            return event_type, event.order_id
+        return None
 
     def _check_type_event(self, message: dict) -> EventTypes:
         """
@@ -418,13 +775,14 @@ class Bot:
         """
         return EventTypes.get_type_name(message)
 
-    def create_event(self, data: Dict[str, Any], event_type: EventTypes) -> events.BaseEvent:
+    def create_event(self, data: Dict[str, Any], event_type: EventTypes = None) -> events.BaseEvent:
         """
         Создает событие из json сообщения
         """
+        frame = decoder.decode(data)
         return self.__event_map.get(
-            event_type, events.BaseEvent
-        ).from_json(data)
+            event_type or frame.type, events.BaseEvent
+        ).from_frame(frame)
 
     def on_message(self, ws, message):
         """
@@ -436,16 +794,64 @@ class Bot:
         :param message: Сообщение в формате JSON.
         :type message: :obj:`dict`
         """
-        msg_json = json.loads(message)
-        e_type = self._check_type_event(msg_json)
-        event = self.create_event(msg_json, EventTypes.get_type_name(msg_json))
-        if not self.first_msg and e_type == EventTypes.CLIENT_CONNECTION:
+        self._process_message(json.loads(message))
+        if self.warm_start:
+            self._autosave_state()
+
+    def _autosave_state(self):
+        """
+        Обновляет снимок состояния, если с прошлого сохранения прошло state_interval секунд.
+        После падения процесса бот продолжит с позиции не старше state_interval, а не с последней остановки.
+        """
+        now = time.monotonic()
+        if now - self._state_saved_at < self.state_interval:
+            return
+        self._state_saved_at = now
+        # Запись с fsync выполняется в потоке диспетчера, чтобы не задерживать чтение вебсокета
+        self.dispatcher.submit(self._save_state_logged)
+
+    def _save_state_logged(self):
+        try:
+            self.save_state()
+        except OSError:
+            logger.exception("Не удалось сохранить снимок состояния")
+
+    def _process_message(self, msg_json: Dict[str, Any]):
+        """
+        Обрабатывает разобранное сообщение вебсокета.
+        """
+        frame = decoder.decode(msg_json)
+        if not self.first_msg and frame.type == EventTypes.CLIENT_CONNECTION:
             self.first_msg = True
-            self.channel = event.channel
+            self.channel = frame.channel
+            self.backoff.reset()
+            # Публикации, пропущенные за время разрыва соединения
+            for recovered in self.recovery.on_connect(frame.data, frame.channel):
+                self._process_message(recovered)
+            self._connected.set()
+            return
+        if frame.channel != self.channel:
+            return
+        self.recovery.update(frame.offset)
+        observers = self._observers.get(frame.type)
+        if not observers and not self._event_handlers(frame.type):
+            # Событие никто не слушает - не тратим время на его разбор
             return
-        if event.channel != self.channel:
+        event = self.__event_map.get(frame.type, events.BaseEvent).from_frame(frame)
+        if self.deduplicator and self.deduplicator.is_duplicate(event.event_type, event.event_id):
             return
-        self._handle_event(event)
+        if observers:
+            # Локальные копии обновляются в потоке вебсокета, чтобы события применялись строго по порядку
+            for observer in observers:
+                observer(event)
+            if not self._event_handlers(frame.type):
+                return
+        seq = names = None
+        if self.journal:
+            # Сообщение сохраняется до передачи обработчикам
+            names = [h.name for h in self._event_handlers(frame.type)]
+            seq = self.journal.append(msg_json, names)
+        self._handle_event(event, frame.type, seq, names)
 
     def on_error(self, ws, error):
         """
@@ -458,7 +864,7 @@ class Bot:
         :type error: :obj:`Exception`
         """
         for handler in self.__ws_error_handlers:
-            Thread(target=handler, args=(error,), daemon=True).start()
+            self.dispatcher.submit(handler, error)
 
     def on_close(self, ws, close_status_code, close_msg):
         """
@@ -473,9 +879,7 @@ class Bot:
         :param close_msg: Сообщение о закрытии.
         :type close_msg: :obj:`str`
         """
-        if self.reconnect_socket:
-            time.sleep(5)
-            self._run_websocket()
+        # Переподключение выполняет цикл в _run_websocket, после возврата из run_forever
 
     def on_open(self, ws):
         """
@@ -485,33 +889,225 @@ class Bot:
         :type ws: :obj:`websocket.WebSocketApp`
         """
         auth_data = {
-            "params": {
-                "token": self.token
-            },
+            "params": self.recovery.connect_params(self.token),
             "id": 1
         }
         ws.send(json.dumps(auth_data))
 
     def _run_websocket(self, **kwargs):
         """
-        Запуск WebSocket клиента.
-        """
-        self.ws = websocket.WebSocketApp(
-            "wss://ws.paygame.ru/connection/websocket",
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            on_open=self.on_open,
-            **kwargs
-        )
-        self.ws.run_forever()
+        Запуск WebSocket клиента. Если включено переподключение, после разрыва соединения
+        подключается заново с экспоненциальной задержкой, без роста стека вызовов.
+        """
+        import websocket
+
+        # После stop диспетчер не принимает задачи, пока не запущен снова
+        self.dispatcher.start()
+        if self.journal:
+            self._replay_journal()
+        self._stop_event.clear()
+        while not self._stop_event.is_set():
+            self.first_msg = False
+            self._connected.clear()
+            self.ws = websocket.WebSocketApp(
+                "wss://ws.paygame.ru/connection/websocket",
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+                on_open=self.on_open,
+                **kwargs
+            )
+            self.ws.run_forever()
+            if not self.reconnect_socket:
+                break
+            self._stop_event.wait(self.backoff.next())
 
     def start(self, **kwargs):
         """
-        Запускает вебсокет (обработчик новых сообщений)
+        Запускает вебсокет (обработчик новых сообщений). Если вебсокет уже запущен
+        методом :meth:`bootstrap`, ждет его завершения.
         """
+        if self._ws_thread and self._ws_thread.is_alive():
+            self._ws_thread.join()
+            return
         self._run_websocket(**kwargs)
 
+    def bootstrap(self, timeout: float = None, **kwargs) -> Dict[str, Any]:
+        """
+        Подготавливает бота к работе: запускает вебсокет в фоновом потоке и одновременно с подключением
+        загружает профиль аккаунта, чаты и последние уведомления. Время запуска определяется самым долгим
+        из запросов, а не их суммой.
+
+        Возвращает управление, когда все данные загружены и вебсокет подключен.
+        Для блокировки до остановки вебсокета после этого можно вызвать :meth:`start`.
+
+        :param timeout: максимальное время ожидания подключения вебсокета в секундах
+        :param kwargs: аргументы для :class:`websocket.WebSocketApp`
+
+        :return: словарь с ключами ``me``, ``chats`` (ChatList) и ``notifications`` (NotificationWidget)
+        :raises TimeoutError: вебсокет не подключился за timeout секунд
+        :raises ConnectionError: поток вебсокета завершился, не подключившись (например, без reconnect_socket)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if not (self._ws_thread and self._ws_thread.is_alive()):
+            self._ws_thread = Thread(target=self._run_websocket, kwargs=kwargs, name="PaygameAPI-websocket",
+                                     daemon=True)
+            self._ws_thread.start()
+
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="PaygameAPI-bootstrap") as executor:
+            me = executor.submit(lambda: self.me)
+            chats = executor.submit(self.get_chats)
+            notifications = executor.submit(self.get_latest_notifications)
+            result = {"me": me.result(), "chats": chats.result(), "notifications": notifications.result()}
+
+        # Ждем короткими интервалами: поток вебсокета может завершиться, так и не подключившись
+        while not self._connected.wait(0.1 if deadline is None else min(max(deadline - time.monotonic(), 0), 0.1)):
+            if not self._ws_thread.is_alive():
+                raise ConnectionError("Вебсокет завершился, не подключившись к каналу")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("Вебсокет не подключился за отведенное время")
+        return result
+
+    def stop(self):
+        """
+        Останавливает вебсокет, отключает переподключение и фоновое обновление токена.
+        Обработчики событий, уже поставленных в очередь, выполняются до возврата из метода.
+        """
+        self._stop_event.set()
+        if getattr(self, "ws", None):
+            self.ws.close()
+        try:
+            self.dispatcher.shutdown()
+            if self.journal:
+                self.journal.flush()
+            if self.chat_mirror is not None:
+                self.chat_mirror.flush()
+            if self.warm_start:
+                self._save_state_logged()
+        finally:
+            self.token_manager.close()
+
+    def save_state(self, path: str = None):
+        """
+        Сохраняет снимок состояния для быстрого перезапуска: access токен, куки сессии
+        (в том числе прохождения проверки Cloudflare), профиль аккаунта и позицию в канале вебсокета.
+        Файл записывается атомарно и доступен только владельцу.
+
+        :param path: путь к файлу. По умолчанию token_path
+        """
+        path = path or self.token_path
+        manager = self.token_manager
+        # Снимок собирается под блокировкой, чтобы более старый снимок не заменил более новый
+        with self._state_lock:
+            state = {
+                "token_hash": hashlib.sha256(self.token.encode()).hexdigest(),
+                "access_token": manager.access_token,
+                "expires_at": manager.expires_at,
+                "cookies": self.client.dump_cookies(),
+                "me": self._me_data,
+                "channel": self.recovery.channel,
+                "epoch": self.recovery.epoch,
+                "offset": self.recovery.offset,
+                "saved_at": time.time(),
+            }
+            # mkstemp создает файл с уникальным именем и правами 0600
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                       prefix=os.path.basename(path) + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+
+    def restore_state(self, path: str = None) -> bool:
+        """
+        Восстанавливает состояние, сохраненное :meth:`save_state`. Снимок другого аккаунта игнорируется.
+        Истекший access токен не восстанавливается - он будет обновлен при первом запросе.
+        Позиция в канале старше max_state_age секунд не восстанавливается: вместо досылки
+        устаревших событий бот подключается с чистого состояния.
+
+        :param path: путь к файлу. По умолчанию token_path
+
+        :return: True, если состояние восстановлено
+        """
+        try:
+            with open(path or self.token_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("token_hash") != hashlib.sha256(self.token.encode()).hexdigest():
+            return False
+
+        if state.get("access_token") and state.get("expires_at", 0) > time.time():
+            self.token_manager.set(state["access_token"], state.get("expires_at"))
+        self.client.load_cookies(state.get("cookies") or [])
+        if state.get("me"):
+            self._me_data = state["me"]
+            self._me = converters.parse_user_profile(state["me"])
+        if state.get("channel") and time.time() - state.get("saved_at", 0) <= self.max_state_age:
+            # При подключении сервер дошлет события, пропущенные за время остановки
+            self.recovery = Recovery(state["channel"], state.get("epoch"), state.get("offset", 0))
+        return True
+
+    def replay(self, source: str | Iterable[Dict[str, Any]], stub_api: bool = True) -> ReplayReport:
+        """
+        Прогоняет записанные сообщения вебсокета через зарегистрированные обработчики в текущем потоке,
+        без вебсокета, пула потоков и журнала. Подходит для проверки новых правил автоответов
+        на реальном трафике.
+
+        Заглушки API устанавливаются на этот экземпляр, поэтому вебсокет бота должен быть остановлен
+        (:meth:`stop`), иначе обработчики живых событий тоже получили бы заглушки.
+
+        :param source: журнал событий (директория), файл с сообщениями в формате JSON по одному на строку
+            или итерируемый объект с сообщениями
+        :param stub_api: заменить методы API заглушками на время прогона
+
+        :return: Экземпляр ReplayReport (событий в секунду, время и срабатывания каждого обработчика, вызовы API)
+        :raises RuntimeError: stub_api включен, а вебсокет бота запущен
+        """
+        running = (self._ws_thread and self._ws_thread.is_alive()) or \
+            (getattr(self, "ws", None) is not None and not self._stop_event.is_set())
+        if stub_api and running:
+            raise RuntimeError("Остановите бота (stop) перед прогоном с заглушками API")
+        report = ReplayReport()
+        messages = read_frames(source) if isinstance(source, str) else source
+        with stubbed_api(self, report) if stub_api else nullcontext():
+            started = perf_counter()
+            for message in messages:
+                report.frames += 1
+                frame = decoder.decode(message)
+                if frame.type == EventTypes.CLIENT_CONNECTION or not self._event_handlers(frame.type):
+                    continue
+                event = self.__event_map.get(frame.type, events.BaseEvent).from_frame(frame)
+                report.events += 1
+                if frame.type == EventTypes.NEW_MESSAGE:
+                    # Как и при обычной обработке, обработчики сообщений подбираются по индексу
+                    handlers, routed = self._message_router.match(event.message.text), True
+                else:
+                    handlers, routed = self._event_handlers(frame.type), False
+                for handler in handlers:
+                    handler_started = perf_counter()
+                    fired = error = False
+                    try:
+                        fired = handler.test(event, routed)
+                        if fired:
+                            handler.handler(event)
+                    except Exception:
+                        error = True
+                        logger.exception("Ошибка в обработчике %s", handler.name)
+                    report.handler(handler.name).add(perf_counter() - handler_started, fired, error)
+            report.elapsed = perf_counter() - started
+        return report
+
 
 
 
@@ -0,0 +1,208 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+from .common import asyncio_helper, converters, exceptions, enums
+from .common.asyncio_helper import AsyncHTTPClient
+from .common.pagination import Watermark, aiter_items, aiter_numbered_pages, aiter_pages
+from .common.ratelimit import RateLimiter
+from .common.tokens import AsyncTokenManager
+from .types import UserProfile, SelfUserProfile, Message, Image, Order, ChatList, NotificationList, Notification, \
+    Review, UserReviews
+
+
+class AsyncBot:
+    """
+    Асинхронный клиент PayGame на aiohttp. Методы повторяют одноименные методы :class:`Bot`,
+    но не блокируют поток, поэтому в одном процессе можно держать сотни одновременных запросов.
+
+    :param token: RefreshToken от PayGame
+    :type token: :obj:`str`
+
+    :param requests_timeout: Таймаут запросов в секундах
+    :type requests_timeout: :obj:`float`
+
+    :param rate_limiter: Ограничитель частоты запросов
+    :type rate_limiter: :obj:`RateLimiter`
+
+    :param client: HTTP клиент (можно разделить между несколькими ботами)
+    :type client: :obj:`AsyncHTTPClient`
+    """
+
+    def __init__(self, token: str, requests_timeout: int | float = 10, rate_limiter: RateLimiter = None,
+                 client: AsyncHTTPClient = None):
+        self.token = token
+        self.requests_timeout = requests_timeout
+
+        self.client = client or AsyncHTTPClient(limiter=rate_limiter)
+        self.rate_limiter = rate_limiter or self.client.limiter
+        self._request_kwargs = {"client": self.client, "limiter": self.rate_limiter, "timeout": requests_timeout}
+        self.token_manager = AsyncTokenManager(token, request_kwargs=self._request_kwargs)
+
+    async def __aenter__(self) -> 'AsyncBot':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Останавливает обновление токена и закрывает соединения.
+        """
+        self.token_manager.close()
+        await self.client.close()
+
+    async def get_user(self, username: str = None, user_id: int = None) -> UserProfile | SelfUserProfile:
+        """
+        Возвращает объект пользователя (см. :meth:`Bot.get_user`)
+
+        :param username: ник пользователя
+        :param user_id: идентификатор пользователя
+
+        :return: Экземпляр UserProfile, если профиль не текущего аккаунта, иначе SelfUserProfile
+        """
+        response = await asyncio_helper.get_user_info(self.token_manager, username, user_id, **self._request_kwargs)
+        return converters.parse_user_profile(response.json())
+
+    async def create_offer(self, game_id: int, offer_type: int, price: int, quantity: int, description: str,
+                           title: str, auto_delivery: list | None = None, is_active: bool = True) -> int:
+        """
+        Создает новый лот (см. :meth:`Bot.create_offer`)
+
+        :return: ID предложения
+        """
+        payload: Dict[str, Any] = {
+            "game": game_id,
+            "offer_type": offer_type,
+            "is_active": is_active,
+            "price": price,
+            "title": title,
+            "description": description,
+            "quantity": quantity,
+            "offer_data": []
+        }
+        if not auto_delivery:
+            payload["unlimited"] = True
+        else:
+            payload["unlimited"] = False
+            payload["auto_delivery"] = [{
+                "blurred": True, "error": None, "id": f"autoDelivery_{i}", "offer": None, "text": text
+            } for i, text in enumerate(auto_delivery, start=1)]
+
+        response = await asyncio_helper.create_offer(self.token_manager, payload, **self._request_kwargs)
+        return response.json().get('id')
+
+    async def get_order(self, order_id: str) -> Order:
+        """
+        Получает заказ по айди
+
+        :param order_id: идентификатор заказа
+        :return: Экземпляр Order
+        """
+        response = await asyncio_helper.get_order(self.token_manager, order_id, **self._request_kwargs)
+        return converters.parse_order(response.json())
+
+    async def send_message(self, chat_id: int, message: str = None, image: str | bytes = None) -> Message:
+        """
+        Отправляет сообщение в указанный чат (chat_id)
+        Должно присутствовать сообщение или медиа
+
+        :param chat_id: ID чата
+        :param message: сообщение. Опционально
+        :param image: UUID изображения для отправки или bytes. Опционально
+
+        :return: Экземпляр Message
+        """
+        if not image and not message:
+            raise exceptions.PayGameAPIError("Нельзя отправить пустое сообщение")
+        if isinstance(image, bytes):
+            uploaded = await self.upload_image(image)
+            if uploaded is None:
+                raise exceptions.PayGameAPIError("Не удалось загрузить изображение")
+            image = uploaded.id
+        response = await asyncio_helper.send_message(self.token_manager, chat_id, message, image,
+                                                     **self._request_kwargs)
+        return converters.parse_message(response.json())
+
+    async def upload_image(self, image: bytes) -> Image:
+        """
+        Выгружает изображение на сервера PayGame
+
+        :param image: байтовые данные изображения
+        :return: Экземпляр Image
+        """
+        response = await asyncio_helper.upload_image(self.token_manager, image, **self._request_kwargs)
+        if (json := response.json()).get("id"):
+            return converters.parse_image(json)
+
+    async def get_chats(self) -> ChatList:
+        """
+        Получает все чаты
+
+        :return: Экземпляр ChatList
+        """
+        response = await asyncio_helper.get_messager(self.token_manager, **self._request_kwargs)
+        return converters.parse_chat_list(response.json())
+
+    async def get_notifications(self, page_size=10, verb: enums.NotificationTypes = None,
+                                cursor: str = None) -> NotificationList:
+        """
+        Получает последние уведомления
+
+        :param page_size: кол-во уведомлений на 1 странице
+        :param verb: Тип уведомления (получить только определенные)
+        :param cursor: курсор для получения следующей/предыдущей страницы уведомлений
+
+        :return: Экземпляр NotificationList
+        """
+        response = await asyncio_helper.get_all_notifications(self.token_manager, page_size, verb, cursor,
+                                                              **self._request_kwargs)
+        return converters.parse_notification_list(response.json())
+
+    def iter_notifications(self, verb: enums.NotificationTypes = None, since: datetime | str = None,
+                           page_size: int = 50, cursor: str = None) -> AsyncIterator[Notification]:
+        """
+        Проходит все уведомления от новых к старым (см. :meth:`Bot.iter_notifications`).
+        Следующая страница запрашивается отдельной задачей, пока обрабатывается текущая.
+
+        Использование: ``async for notification in bot.iter_notifications(since=last_uuid): ...``
+
+        :return: асинхронный генератор экземпляров Notification
+        """
+        watermark = Watermark(since) if since is not None else None
+        pages = aiter_pages(lambda c: self.get_notifications(page_size, verb, c), cursor,
+                            last=watermark.page_reached if watermark else None)
+        return aiter_items(pages, watermark.reached if watermark else None)
+
+    async def get_reviews(self, username: str, page: int = 1) -> UserReviews:
+        """
+        Получает отзывы пользователя
+
+        :param username: Юзернейм пользователя
+        :param page: Номер страницы
+
+        :return: экзепляр UserReviews
+        """
+        response = await asyncio_helper.get_reviews(self.token_manager, username, page, **self._request_kwargs)
+        return converters.parse_rewiews(response.json())
+
+    async def iter_reviews(self, username: str, concurrency: int = 4) -> AsyncIterator[Review]:
+        """
+        Проходит все отзывы пользователя по порядку страниц (см. :meth:`Bot.iter_reviews`).
+
+        :return: асинхронный генератор экземпляров Review
+        """
+        pages = aiter_numbered_pages(lambda number: self.get_reviews(username, number), concurrency=concurrency)
+        try:
+            async for page in pages:
+                for review in page.results:
+                    yield review
+        finally:
+            await pages.aclose()
+
+    async def get_all_reviews(self, username: str, concurrency: int = 4) -> List[Review]:
+        """
+        Получает все отзывы пользователя (см. :meth:`Bot.get_all_reviews`)
+
+        :return: список экземпляров Review
+        """
+        return [review async for review in self.iter_reviews(username, concurrency)]
@@ -1,21 +1,54 @@
+from __future__ import annotations
+
 import time
-from typing import Any, Dict, Literal, Optional, Union
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, Literal, Optional, Union
 
 from . import enums
 from ..types import API_Methods
-import cloudscraper
-from requests import Response
 
+from .client import HTTPClient
 from .exceptions import UnauthorizedError, RequestFailedError, IncorrectRequest
+from .ratelimit import RateLimiter
+from .tokens import TokenManager
+
+if TYPE_CHECKING:
+    from requests import Response
 
 API_URL_V1 = API_Methods.url_v1
 
-session = cloudscraper.create_scraper()
+_session = None  # Общая сессия для запросов без собственного HTTPClient, создается при первом запросе
+_session_lock = Lock()
+default_limiter = RateLimiter()  # Общий ограничитель для запросов без собственного ограничителя
+
+
+def get_session():
+    """
+    Возвращает общую сессию cloudscraper, создавая ее при первом обращении.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import cloudscraper
+
+                _session = cloudscraper.create_scraper()
+    return _session
+
+
+def __getattr__(name: str):
+    # apihelper.session остается доступным, но сессия создается только при обращении к нему
+    if name == "session":
+        return get_session()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def _make_request(request_method: Literal["post", "get", "patch"], api_method: str, headers: Dict[str, str] = None,
-                  payload: Any = None, requests_delay: int = 0.5, params: Dict[str, Any] = None, files: dict = None,
-                  token: Optional[str] = None, timeout: Union[int, float] = 10,
-                  raise_not_200: bool = False, refresh_token: bool = False, max_refresh_attempts: int = 1) -> Response:
+                  payload: Any = None, requests_delay: Optional[float] = None, params: Dict[str, Any] = None,
+                  files: dict = None, token: Optional[Union[str, TokenManager]] = None, timeout: Union[int, float] = 10,
+                  raise_not_200: bool = False, refresh_token: bool = False, max_refresh_attempts: int = 1,
+                  limiter: Optional[RateLimiter] = None, max_throttle_retries: int = 3,
+                  client: Optional[HTTPClient] = None) -> Response:
     """
     Отправляет запрос к API.
 
@@ -31,11 +64,14 @@ def _make_request(request_method: Literal["post", "get", "patch"], api_method: s
     :param payload: полезная нагрузка.
     :type payload: :obj:`dict`
 
+    :param requests_delay: фиксированная задержка перед запросом. Если не указана, частоту запросов регулирует limiter.
+    :type requests_delay: :obj:`float`, опционально
+
     :param params: Параметры запроса.
     :type params: :obj:`dict`
 
-    :param token: токен для авторизации.
-    :type token: :obj:`str`, опционально
+    :param token: токен для авторизации или менеджер токенов.
+    :type token: :obj:`str` или :obj:`TokenManager`, опционально
 
     :param timeout: таймаут запроса.
     :type timeout: :obj:`int` или :obj:`float`
@@ -49,13 +85,29 @@ def _make_request(request_method: Literal["post", "get", "patch"], api_method: s
     :param max_refresh_attempts: Максимальное количество попыток обновления токена.
     :type max_refresh_attempts: :obj:`int`
 
+    :param limiter: ограничитель частоты запросов. По умолчанию - ограничитель клиента или общий для модуля.
+    :type limiter: :obj:`RateLimiter`, опционально
+
+    :param max_throttle_retries: Сколько раз повторять запрос после ответа 429.
+    :type max_throttle_retries: :obj:`int`
+
+    :param client: HTTP клиент бота. По умолчанию используется общая для модуля сессия.
+    :type client: :obj:`HTTPClient`, опционально
+
     :return: объект ответа.
     :rtype: :class:`Response`
     """
+    http = client.session if client else get_session()
+    limiter = limiter or (client.limiter if client else default_limiter)
     attempt = 0
+    throttled = 0
     while attempt <= max_refresh_attempts:
-        if refresh_token and token:
-            token = _refresh_token(token)
+        if isinstance(token, TokenManager):
+            access_token = token.get()
+        else:
+            if refresh_token and token:
+                token = _refresh_token(token)
+            access_token = token
         headers = headers or {}
         if 'User-Agent' not in headers:
             headers[
@@ -64,27 +116,45 @@ def _make_request(request_method: Literal["post", "get", "patch"], api_method: s
             headers['Accept'] = 'application/json, text/plain, */*'
         if 'Connection' not in headers:
             headers['Connection'] = 'keep-alive'
-        if token:
-            headers["Cookie"] = f"refreshToken={token}"
+        # refreshToken передается вместе с куками сессии, а не заголовком Cookie:
+        # явный заголовок заменил бы куки сессии (в том числе прохождения проверки Cloudflare)
+        cookies = None
+        if isinstance(token, TokenManager):
+            cookies = {"refreshToken": token.refresh_token}
+            headers["Authorization"] = f"Bearer {access_token}"
+        elif token:
+            cookies = {"refreshToken": token}
             headers["Authorization"] = f"Bearer {token}"
 
         if not api_method.startswith("https://"):
             api_method = API_URL_V1 + api_method
 
-        time.sleep(requests_delay)
-        response = getattr(session, request_method)(
+        if requests_delay is not None:
+            time.sleep(requests_delay)
+        else:
+            limiter.acquire(api_method)
+        response = getattr(http, request_method)(
             api_method,
             headers=headers,
             data=payload,
             params=params,
             timeout=timeout,
-            files=files
+            files=files,
+            cookies=cookies
         )
+        limiter.update(api_method, response.status_code, response.headers.get("Retry-After"))
+
+        if response.status_code == 429 and throttled < max_throttle_retries:
+            throttled += 1
+            continue
 
         if response.status_code in (403, 401):
             if attempt < max_refresh_attempts:
                 attempt += 1
-                refresh_token = True
+                if isinstance(token, TokenManager):
+                    token.invalidate(access_token)
+                else:
+                    refresh_token = True
                 continue
             else:
                 raise UnauthorizedError(response)
@@ -98,7 +168,7 @@ def _make_request(request_method: Literal["post", "get", "patch"], api_method: s
     raise UnauthorizedError("Исчерпано максимально кол-во попыток обновления токена")
 
 
-def _refresh_token(token: str) -> str:
+def _refresh_token(token: str, **kwargs) -> str:
     """
     Обновляет токен.
 
@@ -108,11 +178,25 @@ def _refresh_token(token: str) -> str:
     payload = {
         "refresh": token
     }
-    response = _make_request("post", API_Methods.refresh, token=token, payload=payload, raise_not_200=True)
+    response = _make_request("post", API_Methods.refresh, token=token, payload=payload, raise_not_200=True,
+                             **kwargs)
     return response.json()['access']
 
 
-def get_user_info(token: str, username: str = None, user_id: int = None) -> Response:
+def _fresh_token(token: Union[str, TokenManager], **kwargs) -> Union[str, TokenManager]:
+    """
+    Возвращает токен, пригодный для запроса.
+    Менеджер токенов сам следит за сроком действия, поэтому обновляется только обычная строка-токен.
+
+    :param token: токен или менеджер токенов
+    :return: access токен или менеджер токенов
+    """
+    if isinstance(token, TokenManager):
+        return token
+    return _refresh_token(token, **kwargs)
+
+
+def get_user_info(token: str, username: str = None, user_id: int = None, **kwargs) -> Response:
     """
     Получает информацию о пользователе.
 
@@ -121,16 +205,16 @@ def get_user_info(token: str, username: str = None, user_id: int = None) -> Resp
 
     :return: Response object
     """
-    token = _refresh_token(token)
+    token = _fresh_token(token, **kwargs)
     params = {}
     if user_id:
         params["id"] = user_id
     if username:
         params["username"] = username
-    return _make_request("get", "profile/user/", params=params, token=token, raise_not_200=True)
+    return _make_request("get", "profile/user/", params=params, token=token, raise_not_200=True, **kwargs)
 
 
-def get_me(api_method: str, headers: Dict[str, str], token: str) -> Response:
+def get_me(api_method: str, headers: Dict[str, str], token: str, **kwargs) -> Response:
     """
     Получает информацию о текущем пользователе.
 
@@ -140,10 +224,21 @@ def get_me(api_method: str, headers: Dict[str, str], token: str) -> Response:
 
     :return: object Response
     """
-    return _make_request("get", api_method, headers, token=token, raise_not_200=True)
+    return _make_request("get", api_method, headers, token=token, raise_not_200=True, **kwargs)
 
 
-def upload_image(token: str, image_data: bytes) -> Response:
+def get_user_data(token: str, **kwargs) -> Response:
+    """
+    Получает данные текущего пользователя в формате JSON.
+
+    :param token: токен для авторизации
+
+    :return: object Response
+    """
+    return _make_request("get", API_Methods.user_data, token=token, raise_not_200=True, **kwargs)
+
+
+def upload_image(token: str, image_data: bytes, **kwargs) -> Response:
     """
     Загружает изображение на сервер PayGame
 
@@ -152,14 +247,14 @@ def upload_image(token: str, image_data: bytes) -> Response:
 
     :return: object Response
     """
-    token = _refresh_token(token)
+    token = _fresh_token(token, **kwargs)
     files = {
         'file': image_data,
     }
-    return _make_request("post", "messager/media/", token=token, files=files)
+    return _make_request("post", "messager/media/", token=token, files=files, **kwargs)
 
 
-def send_message(token: str, chat: int, message: str = None, image: str = None) -> Response:
+def send_message(token: str, chat: int, message: str = None, image: str = None, **kwargs) -> Response:
     """
     Отправляет сообщение в указанный чат
 
@@ -175,12 +270,12 @@ def send_message(token: str, chat: int, message: str = None, image: str = None)
         data["text"] = message
     if image:
         data["media"] = image
-    token = _refresh_token(token)
+    token = _fresh_token(token, **kwargs)
     return _make_request("post", f"messager/{chat}/add/", payload=data,
-                         raise_not_200=True, token=token)
+                         raise_not_200=True, token=token, **kwargs)
 
 
-def get_order(token: str, order_id: str):
+def get_order(token: str, order_id: str, **kwargs):
     """
     Получает информацию о заказе
 
@@ -189,12 +284,12 @@ def get_order(token: str, order_id: str):
 
     :return: object Response
     """
-    token = _refresh_token(token)
-    return _make_request("get", f"orders/order/{order_id}/detail/", token=token)
+    token = _fresh_token(token, **kwargs)
+    return _make_request("get", f"orders/order/{order_id}/detail/", token=token, **kwargs)
 
 
 def get_all_notifications(token: str, page_size: int = 10, verb: enums.NotificationTypes = None,
-                          cursor: str = None) -> Response:
+                          cursor: str = None, **kwargs) -> Response:
     """
     Получает все уведомления
 
@@ -212,10 +307,10 @@ def get_all_notifications(token: str, page_size: int = 10, verb: enums.Notificat
         params["verb"] = verb
     if cursor:
         params["cursor"] = cursor
-    return _make_request("get", "notifications/", params=params, token=token)
+    return _make_request("get", "notifications/", params=params, token=token, **kwargs)
 
 
-def get_latest_notifications(token: str) -> Response:
+def get_latest_notifications(token: str, **kwargs) -> Response:
     """
     Получает последние уведомления
 
@@ -223,10 +318,10 @@ def get_latest_notifications(token: str) -> Response:
 
     :return: object Response
     """
-    return _make_request("get", "notifications/latest-notifications/", token=token)
+    return _make_request("get", "notifications/latest-notifications/", token=token, **kwargs)
 
 
-def read_messages(token: str, chat_id: int) -> Response:
+def read_messages(token: str, chat_id: int, **kwargs) -> Response:
     """
     Читает сообщения в чате
 
@@ -235,24 +330,27 @@ def read_messages(token: str, chat_id: int) -> Response:
 
     :return: object Response
     """
-    return _make_request("post", f"messager/{chat_id}/read/", token=token)
+    return _make_request("post", f"messager/{chat_id}/read/", token=token, **kwargs)
 
 
-def get_chat_messages(token: str, chat_id: int, page_size: int = 25) -> Response:
+def get_chat_messages(token: str, chat_id: int, page_size: int = 25, cursor: str = None, **kwargs) -> Response:
     """
     Получает сообщения из чата
 
     :param token: токен для авторизации
     :param chat_id: ID чата
     :param page_size: количество сообщений на странице
+    :param cursor: курсор для пагинации
 
     :return: object Response
     """
     params = {"id": chat_id, "page_size": page_size}
-    return _make_request("get", f"messager/detail/", token=token, params=params)
+    if cursor:
+        params["cursor"] = cursor
+    return _make_request("get", f"messager/detail/", token=token, params=params, **kwargs)
 
 
-def mark_all_as_read(token: str) -> Response:
+def mark_all_as_read(token: str, **kwargs) -> Response:
     """
     Помечает все уведомления как прочитанные
 
@@ -260,10 +358,10 @@ def mark_all_as_read(token: str) -> Response:
 
     :return: object Response
     """
-    return _make_request("post", "notifications/mark-all-as-read/", token=token)
+    return _make_request("post", "notifications/mark-all-as-read/", token=token, **kwargs)
 
 
-def get_messager(token: str):
+def get_messager(token: str, **kwargs):
     """
     Получает информацию о мессенджере, в том числе список чатов
 
@@ -271,22 +369,22 @@ def get_messager(token: str):
 
     :return: object Response
     """
-    return _make_request("get", "messager/", token=token)
+    return _make_request("get", "messager/", token=token, **kwargs)
 
 
-def get_reviews(token: str, username: str, page: int = 1) -> Response:
+def get_reviews(token: str, username: str, page: int = 1, **kwargs) -> Response:
     """
     :param token: токен для аавторизации
     :param username: юзернейм пользователя
     
     :return: объект Response
     """
-    token = _refresh_token(token)
+    token = _fresh_token(token, **kwargs)
     data = {"username": username}
-    return _make_request("get", f"orders/review/{username}/", params={"page": page}, token=token, payload=data)
+    return _make_request("get", f"orders/review/{username}/", params={"page": page}, token=token, payload=data, **kwargs)
 
 
-def reply_to_review(token: str, review_id: int, text: str, edit: bool = False) -> Response:
+def reply_to_review(token: str, review_id: int, text: str, edit: bool = False, **kwargs) -> Response:
     """
     Отвечает на отзыв
 
@@ -301,11 +399,11 @@ def reply_to_review(token: str, review_id: int, text: str, edit: bool = False) -
     method = f"orders/review/reply/{review_id}/"
     if edit:
         method += "edit/"
-    return _make_request("patch", method, token=token, payload=data)
+    return _make_request("patch", method, token=token, payload=data, **kwargs)
 
 
 def change_data(token: str, em_not: bool = False, tg_ap: bool = True, tg_not: bool = True, brwsr_not: bool = False,
-                tg_wio: bool = False):
+                tg_wio: bool = False, **kwargs):
     """
     Изменение настроек уведомлений профиля
 
@@ -325,10 +423,10 @@ def change_data(token: str, em_not: bool = False, tg_ap: bool = True, tg_not: bo
         "telegram_when_i_online": tg_wio
     }
     return _make_request("patch", API_Methods.change_data, payload=payload,
-                             token=token)
+                             token=token, **kwargs)
 
 
-def change_password(token: str, old_password: str, new_password: str) -> Response:
+def change_password(token: str, old_password: str, new_password: str, **kwargs) -> Response:
     """
     Меняет пароль на аккаунте
 
@@ -343,7 +441,7 @@ def change_password(token: str, old_password: str, new_password: str) -> Respons
         "password": new_password,
         "re_password": new_password
     }
-    return _make_request("post", "user/password/change-password/", token=token, payload=data)
+    return _make_request("post", "user/password/change-password/", token=token, payload=data, **kwargs)
 
 
 
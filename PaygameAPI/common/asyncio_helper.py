@@ -0,0 +1,306 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any, Dict, Literal, Optional, Union
+
+import aiohttp
+from multidict import CIMultiDict
+
+from . import enums
+from ..types import API_Methods
+from .exceptions import UnauthorizedError, RequestFailedError, IncorrectRequest
+from .ratelimit import RateLimiter
+from .tokens import AsyncTokenManager
+
+API_URL_V1 = API_Methods.url_v1
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Connection': 'keep-alive',
+}
+
+
+class AsyncResponse:
+    """
+    Ответ на асинхронный запрос.
+    Повторяет ту часть интерфейса :class:`requests.Response`, которой пользуются конвертеры и исключения.
+    """
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes, request: SimpleNamespace):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.request = request
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class AsyncHTTPClient:
+    """
+    Асинхронный HTTP клиент на aiohttp с пулом соединений.
+
+    :param limit: Максимальное количество одновременных соединений
+    :type limit: :obj:`int`
+
+    :param limit_per_host: Максимальное количество соединений к одному хосту
+    :type limit_per_host: :obj:`int`
+
+    :param keepalive_timeout: Сколько секунд держать простаивающее соединение открытым
+    :type keepalive_timeout: :obj:`float`
+
+    :param limiter: Ограничитель частоты запросов
+    :type limiter: :obj:`RateLimiter`
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 30, keepalive_timeout: float = 30,
+                 limiter: RateLimiter = None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.limiter = limiter or RateLimiter()
+        self.session: aiohttp.ClientSession | None = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает сессию, создавая ее при первом обращении (aiohttp требует запущенный цикл событий).
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        """
+        Закрывает сессию и все соединения пула.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+default_client: AsyncHTTPClient | None = None  # Общий клиент для запросов без собственного клиента
+
+
+def _form_fields(payload: Any) -> Any:
+    """
+    Готовит словарь для отправки формой так же, как это делает requests: списки разворачиваются в повторяющиеся
+    поля, остальные значения приводятся к строке.
+    """
+    if not isinstance(payload, dict):
+        return payload
+    fields = []
+    for key, value in payload.items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            fields.append((key, item if isinstance(item, (str, bytes)) else str(item)))
+    return fields
+
+
+async def _make_request(request_method: Literal["post", "get", "patch"], api_method: str,
+                        headers: Dict[str, str] = None, payload: Any = None, params: Dict[str, Any] = None,
+                        files: dict = None, token: Optional[Union[str, AsyncTokenManager]] = None,
+                        timeout: Union[int, float] = 10, max_refresh_attempts: int = 1,
+                        limiter: Optional[RateLimiter] = None, max_throttle_retries: int = 3,
+                        client: Optional[AsyncHTTPClient] = None) -> AsyncResponse:
+    """
+    Отправляет асинхронный запрос к API. Аргументы совпадают с :func:`apihelper._make_request`.
+
+    :param client: HTTP клиент бота. По умолчанию используется общий для модуля клиент.
+    :type client: :obj:`AsyncHTTPClient`, опционально
+
+    :return: объект ответа.
+    :rtype: :class:`AsyncResponse`
+    """
+    global default_client
+    if client is None:
+        client = default_client = default_client or AsyncHTTPClient()
+    limiter = limiter or client.limiter
+    session = await client.get_session()
+
+    if not api_method.startswith("https://"):
+        api_method = API_URL_V1 + api_method
+    if params:
+        params = {k: str(v) for k, v in params.items()}
+
+    attempt = 0
+    throttled = 0
+    while attempt <= max_refresh_attempts:
+        access_token = await token.get() if isinstance(token, AsyncTokenManager) else token
+        request_headers = {**DEFAULT_HEADERS, **(headers or {})}
+        if isinstance(token, AsyncTokenManager):
+            request_headers["Cookie"] = f"refreshToken={token.refresh_token}"
+        elif token:
+            request_headers["Cookie"] = f"refreshToken={token}"
+        if access_token:
+            request_headers["Authorization"] = f"Bearer {access_token}"
+
+        data = _form_fields(payload)
+        if files:
+            data = aiohttp.FormData()
+            for name, value in files.items():
+                data.add_field(name, value, filename=name)
+
+        wait = limiter.reserve(api_method)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        async with session.request(request_method.upper(), api_method, headers=request_headers, data=data,
+                                   params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            request = SimpleNamespace(method=request_method.upper(), url=str(resp.url),
+                                      headers=CIMultiDict(request_headers), body=payload)
+            response = AsyncResponse(resp.status, CIMultiDict(resp.headers), await resp.read(), request)
+        limiter.update(api_method, response.status_code, response.headers.get("Retry-After"))
+
+        if response.status_code == 429 and throttled < max_throttle_retries:
+            throttled += 1
+            continue
+
+        if response.status_code in (403, 401):
+            if attempt < max_refresh_attempts and isinstance(token, AsyncTokenManager):
+                attempt += 1
+                await token.invalidate(access_token)
+                continue
+            raise UnauthorizedError(response)
+        if response.status_code == 400:
+            raise IncorrectRequest(response)
+        if response.status_code not in (200, 201):
+            raise RequestFailedError(response)
+
+        return response
+
+
+async def _refresh_token(token: str, **kwargs) -> str:
+    """
+    Обновляет токен.
+
+    :param token: RefreshToken
+    :return: access токен
+    """
+    response = await _make_request("post", API_Methods.refresh, token=token, payload={"refresh": token},
+                                   max_refresh_attempts=0, **kwargs)
+    return response.json()['access']
+
+
+async def get_user_info(token: AsyncTokenManager, username: str = None, user_id: int = None,
+                        **kwargs) -> AsyncResponse:
+    """
+    Получает информацию о пользователе.
+
+    :param token: менеджер токенов
+    :param username: Ник пользователя
+    :param user_id: ID пользователя
+
+    :return: объект AsyncResponse
+    """
+    params = {}
+    if user_id:
+        params["id"] = user_id
+    if username:
+        params["username"] = username
+    return await _make_request("get", "profile/user/", params=params, token=token, **kwargs)
+
+
+async def upload_image(token: AsyncTokenManager, image_data: bytes, **kwargs) -> AsyncResponse:
+    """
+    Загружает изображение на сервер PayGame
+
+    :param token: менеджер токенов
+    :param image_data: байтовые данные изображения
+
+    :return: объект AsyncResponse
+    """
+    return await _make_request("post", "messager/media/", token=token, files={'file': image_data}, **kwargs)
+
+
+async def send_message(token: AsyncTokenManager, chat: int, message: str = None, image: str = None,
+                       **kwargs) -> AsyncResponse:
+    """
+    Отправляет сообщение в указанный чат
+
+    :param token: менеджер токенов
+    :param chat: ID чата
+    :param message: текст сообщения
+    :param image: UUID изображения на сервере PayGame
+
+    :return: объект AsyncResponse
+    """
+    data = {}
+    if message:
+        data["text"] = message
+    if image:
+        data["media"] = image
+    return await _make_request("post", f"messager/{chat}/add/", payload=data, token=token, **kwargs)
+
+
+async def get_order(token: AsyncTokenManager, order_id: str, **kwargs) -> AsyncResponse:
+    """
+    Получает информацию о заказе
+
+    :param token: менеджер токенов
+    :param order_id: ID заказа
+
+    :return: объект AsyncResponse
+    """
+    return await _make_request("get", f"orders/order/{order_id}/detail/", token=token, **kwargs)
+
+
+async def get_all_notifications(token: AsyncTokenManager, page_size: int = 10, verb: enums.NotificationTypes = None,
+                                cursor: str = None, **kwargs) -> AsyncResponse:
+    """
+    Получает все уведомления
+
+    :param token: менеджер токенов
+    :param page_size: кол-во уведомлений на 1 странице
+    :param verb: тип уведомления
+    :param cursor: курсор для пагинации
+
+    :return: объект AsyncResponse
+    """
+    params = {"page_size": page_size}
+    if verb:
+        params["verb"] = verb
+    if cursor:
+        params["cursor"] = cursor
+    return await _make_request("get", "notifications/", params=params, token=token, **kwargs)
+
+
+async def get_messager(token: AsyncTokenManager, **kwargs) -> AsyncResponse:
+    """
+    Получает информацию о мессенджере, в том числе список чатов
+
+    :param token: менеджер токенов
+
+    :return: объект AsyncResponse
+    """
+    return await _make_request("get", "messager/", token=token, **kwargs)
+
+
+async def get_reviews(token: AsyncTokenManager, username: str, page: int = 1, **kwargs) -> AsyncResponse:
+    """
+    Получает отзывы пользователя
+
+    :param token: менеджер токенов
+    :param username: юзернейм пользователя
+    :param page: номер страницы
+
+    :return: объект AsyncResponse
+    """
+    return await _make_request("get", f"orders/review/{username}/", params={"page": page}, token=token,
+                               payload={"username": username}, **kwargs)
+
+
+async def create_offer(token: AsyncTokenManager, payload: Dict[str, Any], **kwargs) -> AsyncResponse:
+    """
+    Создает новый лот
+
+    :param token: менеджер токенов
+    :param payload: данные лота
+
+    :return: объект AsyncResponse
+    """
+    return await _make_request("post", API_Methods.create_offer, payload=payload, token=token, **kwargs)
@@ -0,0 +1,157 @@
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ..types import UserProfile
+
+
+def _profile_fields(profile: UserProfile) -> Iterator[Tuple[str, Any]]:
+    # Поля профиля, как у объектов с __dict__, так и у объектов со __slots__
+    if hasattr(profile, "__dict__"):
+        yield from vars(profile).items()
+        return
+    for cls in type(profile).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(profile, name):
+                yield name, getattr(profile, name)
+
+
+class _Entry:
+    __slots__ = ("profile", "expires_at", "full")
+
+    def __init__(self, profile: UserProfile, expires_at: float, full: bool):
+        self.profile = profile
+        self.expires_at = expires_at
+        self.full = full
+
+
+class ProfileCache:
+    """
+    Кэш профилей пользователей по ID и нику с ограничением размера (LRU) и времени жизни.
+
+    Полные профили (ответ :meth:`Bot.get_user`) отдаются из кэша, пока не истекли.
+    Частичные профили (отправитель сообщения, пользователи чатов, заказов и отзывов)
+    не отдаются как полные, но их непустые поля обновляют уже сохраненный профиль.
+
+    :param max_size: Максимальное количество профилей
+    :type max_size: :obj:`int`
+
+    :param ttl: Время жизни полного профиля в секундах
+    :type ttl: :obj:`float`
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0  # Профилей, отданных из кэша
+        self.misses = 0  # Запросов, не найденных в кэше
+        self.evicted = 0  # Профилей, вытесненных по размеру
+        self.expired = 0  # Профилей, удаленных по времени жизни
+        self.merged = 0  # Частичных профилей, объединенных с сохраненными
+
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._usernames: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, user_id: int = None, username: str = None, partial: bool = False) -> Optional[UserProfile]:
+        """
+        Возвращает профиль из кэша. ID имеет больший вес, если переданы оба аргумента.
+
+        :param user_id: ID пользователя
+        :param username: ник пользователя
+        :param partial: вернуть и частичный профиль
+
+        :return: Экземпляр UserProfile или None, если профиля нет или он устарел
+        """
+        with self._lock:
+            if user_id is None and username:
+                user_id = self._usernames.get(username.lower())
+            entry = self._entries.get(user_id) if user_id is not None else None
+            if entry is not None and entry.full and entry.expires_at <= time.monotonic():
+                self._remove(user_id)
+                self.expired += 1
+                entry = None
+            if entry is None or not (entry.full or partial):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.profile
+
+    def put(self, profile: UserProfile, full: bool = True) -> UserProfile:
+        """
+        Сохраняет профиль.
+
+        :param profile: профиль пользователя
+        :param full: полный ли профиль. Частичный профиль объединяется с сохраненным
+
+        :return: сохраненный профиль
+        """
+        if profile is None or profile.id is None:
+            return profile
+        with self._lock:
+            entry = self._entries.get(profile.id)
+            if full:
+                entry = _Entry(profile, time.monotonic() + self.ttl, True)
+            elif entry is not None:
+                merged = copy.copy(entry.profile)
+                for name, value in _profile_fields(profile):
+                    if value is not None:
+                        setattr(merged, name, value)
+                entry = _Entry(merged, entry.expires_at, entry.full)
+                self.merged += 1
+            else:
+                entry = _Entry(profile, 0, False)
+
+            old = self._entries.get(profile.id)
+            if old is not None and old.profile.username and old.profile.username != entry.profile.username:
+                self._usernames.pop(old.profile.username.lower(), None)
+            self._entries[profile.id] = entry
+            self._entries.move_to_end(profile.id)
+            if entry.profile.username:
+                self._usernames[entry.profile.username.lower()] = profile.id
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evicted += 1
+            return entry.profile
+
+    def _remove(self, user_id: int):
+        entry = self._entries.pop(user_id)
+        username = entry.profile.username
+        if username and self._usernames.get(username.lower()) == user_id:
+            del self._usernames[username.lower()]
+
+    def invalidate(self, user_id: int = None, username: str = None):
+        """
+        Удаляет профиль из кэша.
+        """
+        with self._lock:
+            if user_id is None and username:
+                user_id = self._usernames.get(username.lower())
+            if user_id in self._entries:
+                self._remove(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._usernames.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Метрики кэша.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+                "expired": self.expired,
+                "merged": self.merged,
+            }
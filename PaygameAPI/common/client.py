@@ -0,0 +1,109 @@
+import socket
+import time
+from threading import RLock
+from typing import Any, Dict, List
+
+from .ratelimit import RateLimiter
+
+
+class HTTPClient:
+    """
+    HTTP клиент бота: собственная сессия cloudscraper с настраиваемым пулом соединений и ограничитель частоты запросов.
+    Один клиент можно явно передать нескольким ботам, если они должны делить соединения и лимиты.
+
+    :param pool_connections: Сколько хостов держать в пуле одновременно
+    :type pool_connections: :obj:`int`
+
+    :param pool_maxsize: Максимальное количество соединений к одному хосту
+    :type pool_maxsize: :obj:`int`
+
+    :param pool_block: Ждать освобождения соединения, если все pool_maxsize заняты (иначе будет открыто лишнее)
+    :type pool_block: :obj:`bool`
+
+    :param keepalive_idle: Через сколько секунд простоя отправлять TCP keep-alive пробы. None - системное значение
+    :type keepalive_idle: :obj:`int`
+
+    :param limiter: Ограничитель частоты запросов
+    :type limiter: :obj:`RateLimiter`
+
+    :param scraper_kwargs: Аргументы для :func:`cloudscraper.create_scraper`
+    """
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16, pool_block: bool = True,
+                 keepalive_idle: int | None = 60, limiter: RateLimiter = None, **scraper_kwargs):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keepalive_idle = keepalive_idle
+
+        self.limiter = limiter or RateLimiter()
+        import cloudscraper
+
+        self.session = cloudscraper.create_scraper(**scraper_kwargs)
+        self.cookies_lock = RLock()  # Защищает куки сессии при выгрузке и подмене
+
+        self._configure_pool()
+
+    def _socket_options(self) -> list:
+        from urllib3.connection import HTTPConnection
+
+        options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if self.keepalive_idle is not None:
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+            if hasattr(socket, "TCP_KEEPINTVL"):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(self.keepalive_idle // 4, 1)))
+        return options
+
+    def _configure_pool(self):
+        # Адаптеры cloudscraper настраивают TLS под Cloudflare, поэтому не заменяем их, а пересоздаем их пулы
+        for adapter in self.session.adapters.values():
+            adapter._pool_connections = self.pool_connections
+            adapter._pool_maxsize = self.pool_maxsize
+            adapter._pool_block = self.pool_block
+            adapter.init_poolmanager(self.pool_connections, self.pool_maxsize, block=self.pool_block,
+                                     socket_options=self._socket_options())
+
+    def get_cookies(self) -> Dict[str, str]:
+        """
+        Возвращает копию кук сессии (в том числе куки прохождения проверки Cloudflare).
+        """
+        with self.cookies_lock:
+            return self.session.cookies.get_dict()
+
+    def set_cookies(self, cookies: Dict[str, str]):
+        """
+        Добавляет куки в сессию.
+
+        :param cookies: куки в виде словаря
+        """
+        with self.cookies_lock:
+            self.session.cookies.update(cookies)
+
+    def dump_cookies(self) -> List[Dict[str, Any]]:
+        """
+        Возвращает куки сессии вместе с доменом, путем и сроком действия (для сохранения на диск).
+        """
+        with self.cookies_lock:
+            return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "expires": c.expires}
+                    for c in self.session.cookies]
+
+    def load_cookies(self, cookies: List[Dict[str, Any]]):
+        """
+        Загружает куки, сохраненные :meth:`dump_cookies`. Истекшие куки пропускаются.
+
+        :param cookies: список кук
+        """
+        now = time.time()
+        with self.cookies_lock:
+            for cookie in cookies:
+                if cookie.get("expires") and cookie["expires"] <= now:
+                    continue
+                self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""),
+                                         path=cookie.get("path", "/"), expires=cookie.get("expires"))
+
+    def close(self):
+        """
+        Закрывает все соединения пула.
+        """
+        self.session.close()
@@ -1,9 +1,10 @@
-from datetime import datetime
-
 from ..types import UserNotifications, UserPlan, UserProfile, SelfUserProfile, Message, OfferData, GameServer, Image, \
     ImageMeta, Order, OrderHistory, Notification, NotificationWidget, Chat, Draft, ChatList, NotificationList, Review, \
-    ReviewReply, ReviewOrder, UserReviews, Blacklist, UserBlacklist, OffersGame
-from typing import Dict, List
+    ReviewReply, ReviewOrder, UserReviews, Blacklist, UserBlacklist, OffersGame, MessageList
+from typing import Any, Dict, List, Tuple
+
+# Identity map одного ответа API: ID пользователя -> (профиль, JSON, из которого он собран)
+UserMap = Dict[int, Tuple[UserProfile, Dict[str, Any]]]
 
 def parse_pages(data: Dict) -> Dict:
     return {
@@ -20,16 +21,44 @@ def parse_pages(data: Dict) -> Dict:
         "end_index": data.get('end_index')
     }
 
-def parse_user_profile(data: Dict) -> UserProfile | SelfUserProfile:
+def parse_user_profile(data: Dict, users: UserMap = None) -> UserProfile | SelfUserProfile:
     """
     Преобразует JSON-объект в экземпляр UserProfile или SelfUserProfile.
 
     :param data: JSON-объект с данными пользователя.
     :type data: :obj:`Dict`
 
+    :param users: Identity map пользователей ответа (пустой словарь, общий для всего ответа).
+        Пользователь, уже разобранный в этом ответе, не разбирается повторно: возвращается тот же объект.
+    :type users: :obj:`Dict`, опционально
+
     :return: Экземпляр UserProfile или SelfUserProfile.
     :rtype: :obj:`UserProfile` или :obj:`SelfUserProfile`
     """
+    if users is None or data.get("id") is None:
+        return _parse_user_profile(data)
+    known = users.get(data["id"])
+    if known is not None and all(key in known[1] and known[1][key] == value for key, value in data.items()):
+        return known[0]
+    profile = _parse_user_profile(data)
+    if known is not None:
+        # Новый объект содержит новые поля или новые значения: обновляем уже выданный профиль.
+        # Слоты берутся по всей иерархии класса, чтобы обновлялись и поля SelfUserProfile
+        target = known[0]
+        for cls in type(target).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                value = getattr(profile, name, None)
+                if value is not None or name.lstrip("_") in data:
+                    setattr(target, name, value)
+        profile = target
+        seen = {**known[1], **data}
+    else:
+        seen = dict(data)
+    users[data["id"]] = (profile, seen)
+    return profile
+
+
+def _parse_user_profile(data: Dict) -> UserProfile | SelfUserProfile:
     plan_data = data.get("plan")
     plan = UserPlan(
         id=plan_data["id"],
@@ -56,13 +85,13 @@ def parse_user_profile(data: Dict) -> UserProfile | SelfUserProfile:
         "id": data["id"],
         "is_online": data.get("is_online"),
         "is_active": data.get("is_active"),
-        "last_active": datetime.fromisoformat(data["last_active"]) if data.get("last_active") else None,
+        "last_active": data.get("last_active"),
         "is_support": data.get("is_support"),
         "banned": banned,
         "notifications": notifications,
         "plan": plan,
         "about": data.get("about"),
-        "date_joined": datetime.fromisoformat(data["date_joined"]) if data.get("date_joined") else None,
+        "date_joined": data.get("date_joined"),
         "rating": data.get("rating"),
         "extra": data.get("extra"),
         "is_verified": data.get("is_verified"),
@@ -97,18 +126,21 @@ def parse_user_profile(data: Dict) -> UserProfile | SelfUserProfile:
         return UserProfile(**common_kwargs)
 
 
-def parse_message(data: Dict) -> Message:
+def parse_message(data: Dict, users: UserMap = None) -> Message:
     """
     Преобразует JSON-объект в экземпляр Message.
 
     :param data: JSON-объект с данными сообщения.
     :type data: :obj:`Dict`
 
+    :param users: Identity map пользователей ответа (см. :func:`parse_user_profile`)
+    :type users: :obj:`Dict`, опционально
+
     :return: Экземпляр Message.
     :rtype: :obj:`Message`
     """
     sender_data = data["sender"]
-    sender = parse_user_profile(sender_data)
+    sender = parse_user_profile(sender_data, users)
 
     return Message(
         id=data["id"],
@@ -162,17 +194,20 @@ def parse_game_server(data: Dict) -> GameServer:
         has_servers=data.get("has_servers")
     )
 
-def parse_offer_data(data: Dict) -> OfferData:
+def parse_offer_data(data: Dict, users: UserMap = None) -> OfferData:
     """
     Преобразует JSON-объект в экземпляр OfferData.
 
     :param data: JSON-объект с данными пользователя.
     :type data: :obj:`Dict`
 
+    :param users: Identity map пользователей ответа (см. :func:`parse_user_profile`)
+    :type users: :obj:`Dict`, опционально
+
     :return: Экземпляр UserProfile или SelfUserProfile.
     :rtype: :obj:`UserProfile` или :obj:`SelfUserProfile`
     """
-    seller = parse_user_profile(data.get("seller", {}))
+    seller = parse_user_profile(data.get("seller", {}), users)
     game = parse_game_server(data.get("game", {}))
     images = [parse_image(image) for image in data.get("media", [])]
 
@@ -197,8 +232,8 @@ def parse_offer_data(data: Dict) -> OfferData:
         video_link=data.get("video_link", ""),
         description=data.get("description", ""),
         game_server=data.get("game_server", []),
-        last_raised=datetime.fromisoformat(data.get("last_raised")) if data.get("last_raised") else None,
-        created_date=datetime.fromisoformat(data.get("created_date")) if data.get("created_date") else None,
+        last_raised=data.get("last_raised"),
+        created_date=data.get("created_date"),
         auto_delivery=data.get("auto_delivery", False),
         minimal_quantity=str(data.get("minimal_quantity", ""))
     )
@@ -217,7 +252,7 @@ def parse_order_history(data: List[Dict]) -> List[OrderHistory]:
         OrderHistory(
             id=item.get("id"),
             state=item.get("state"),
-            created_date=datetime.fromisoformat(item.get("created_date"))
+            created_date=item.get("created_date")
         )
         for item in data
     ]
@@ -232,10 +267,11 @@ def parse_order(data: Dict) -> 'Order':
     :return: Экземпляр Order.
     :rtype: :obj:`Order`
     """
-    customer = parse_user_profile(data.get("customer", {}))
-    seller = parse_user_profile(data.get("seller", {}))
-    offer_data = parse_offer_data(data.get("offer_data", {}))
-    offer = parse_offer_data(data.get("offer", {}))
+    users: UserMap = {}
+    customer = parse_user_profile(data.get("customer", {}), users)
+    seller = parse_user_profile(data.get("seller", {}), users)
+    offer_data = parse_offer_data(data.get("offer_data", {}), users)
+    offer = parse_offer_data(data.get("offer", {}), users)
     order_history = parse_order_history(data.get("order_history", []))
 
     return Order(
@@ -246,14 +282,14 @@ def parse_order(data: Dict) -> 'Order':
         seller=seller,
         nickname=data.get("nickname"),
         state=data.get("state"),
-        created_date=datetime.fromisoformat(data.get("created_date")),
+        created_date=data.get("created_date"),
         offer_data=offer_data,
         reviewed=data.get("reviewed", False),
         offer=offer,
         order_history=order_history,
         transaction=data.get("transaction"),
         funds_requested=data.get("funds_requested", False),
-        deadline=datetime.fromisoformat(data.get("deadline")) if data.get("deadline") else None,
+        deadline=data.get("deadline"),
         auto_delivery=data.get("auto_delivery", []),
         options=data.get("options", [])
     )
@@ -262,12 +298,12 @@ def parse_order(data: Dict) -> 'Order':
 def parse_notification(data: Dict) -> Notification:
     return Notification(
         is_read=data.get("is_read"),
-        created_date=datetime.fromisoformat(data.get("created_date")),
+        created_date=data.get("created_date"),
         uuid_id=data.get("uuid_id"),
         verb=data.get("verb"),
         content_id=data.get("content_id"),
         title=data.get("title"),
-        date_of_reading=datetime.fromisoformat(data.get("date_of_reading")) if data.get("date_of_reading") else None,
+        date_of_reading=data.get("date_of_reading"),
         meta=data.get("meta")
     )
 
@@ -293,9 +329,10 @@ def parse_chat_list(data: Dict) -> ChatList:
     :rtype: :obj:`ChatList`
     """
     chat_results = []
+    known_users: UserMap = {}
     for chat in data.get('results', []):
-        users = [parse_user_profile(user) for user in chat.get('users', [])]
-        last_message = parse_message(chat.get('last_message'))
+        users = [parse_user_profile(user, known_users) for user in chat.get('users', [])]
+        last_message = parse_message(chat.get('last_message'), known_users)
         draft_data = chat.get('draft')
         draft = Draft(text=draft_data['text'], has_media=draft_data['has_media']) if draft_data else None
 
@@ -319,6 +356,26 @@ def parse_chat_list(data: Dict) -> ChatList:
         results=chat_results
     )
 
+def parse_message_list(data: Dict) -> MessageList:
+    """
+    Преобразует JSON-объект чата (см. :func:`apihelper.get_chat_messages`) в страницу сообщений.
+
+    :param data: JSON-объект с данными чата.
+    :type data: :obj:`Dict`
+
+    :return: Экземпляр MessageList
+    """
+    page = data.get('data') or {}
+    users: UserMap = {}
+
+    return MessageList(
+        next=page.get('next'),
+        previous=page.get('previous'),
+        next_cursor=page.get('next_cursor'),
+        previous_cursor=page.get('previous_cursor'),
+        results=[parse_message(message, users) for message in page.get('results', [])]
+    )
+
 def parse_chat_messages(data: Dict) -> Chat:
     """
     Преобразует JSON-объект в экземпляр Chat.
@@ -329,8 +386,9 @@ def parse_chat_messages(data: Dict) -> Chat:
     :return: Экземпляр Chat.
     :rtype: :obj:`Chat`
     """
-    users = [parse_user_profile(user) for user in data.get('users', [])]
-    messages = [parse_message(message) for message in data.get('data', {}).get('results', [])]
+    known_users: UserMap = {}
+    users = [parse_user_profile(user, known_users) for user in data.get('users', [])]
+    messages = [parse_message(message, known_users) for message in data.get('data', {}).get('results', [])]
     draft_data = data.get('draft')
     draft = Draft(text=draft_data['text'], has_media=draft_data['has_media']) if draft_data else None
 
@@ -369,22 +427,25 @@ def parse_notification_list(data: Dict[str, str]) -> NotificationList:
     )
 
 
-def parse_review(data: Dict) -> Review:
+def parse_review(data: Dict, users: UserMap = None) -> Review:
     """
     Преобразует JSON-объект в экземпляр Review.
 
     :param data: JSON-объект с данными обзора.
     :type data: :obj:`Dict`
 
+    :param users: Identity map пользователей ответа (см. :func:`parse_user_profile`)
+    :type users: :obj:`Dict`, опционально
+
     :return: Экземпляр Review.
     """
-    seller = parse_user_profile(data["recipient"])
+    seller = parse_user_profile(data["recipient"], users)
 
-    author = parse_user_profile(data["author"])
+    author = parse_user_profile(data["author"], users)
 
     reply = ReviewReply(
         text=data['reply']['text'],
-        date=datetime.fromisoformat(data['reply']['date'])
+        date=data['reply']['date']
     ) if data.get('reply') else None
 
     order = ReviewOrder(
@@ -402,7 +463,7 @@ def parse_review(data: Dict) -> Review:
         text=data['text'],
         reply=reply,
         order=order,
-        created_date=datetime.fromisoformat(data['created_date']),
+        created_date=data['created_date'],
         is_anonymous=data['is_anonymous'],
         is_included_in_rating=data['is_included_in_rating']
     )
@@ -416,7 +477,8 @@ def parse_rewiews(data: Dict) -> UserReviews:
 
     :return: Экземпляр UserReviews.
     """
-    reviews = [parse_review(review) for review in data.get('results', [])]
+    users: UserMap = {}
+    reviews = [parse_review(review, users) for review in data.get('results', [])]
     kwargs = parse_pages(data)
     return UserReviews(results=reviews, **kwargs)
 
@@ -429,7 +491,8 @@ def parse_blacklist(data: Dict) -> Blacklist:
 
     :return: Экземпляр Blacklist.
     """
-    results = [parse_user_profile(u) for u in data.get("results", [])]
+    users: UserMap = {}
+    results = [parse_user_profile(u, users) for u in data.get("results", [])]
     kwargs = parse_pages(data)
     return Blacklist(results=results, **kwargs)
 
@@ -442,7 +505,8 @@ def parse_offers_from_game(data: Dict) -> OffersGame:
 
     :return: Экземпляр OffersGame.
     """
-    offers = [parse_offer_data(offer) for offer in data.get("results", [])]
+    users: UserMap = {}
+    offers = [parse_offer_data(offer, users) for offer in data.get("results", [])]
     kwargs = parse_pages(data)
     return OffersGame(results=offers, **kwargs)
 
@@ -0,0 +1,64 @@
+from typing import Any, Dict, Optional
+
+from .enums import EventTypes
+
+# Тип публикации (поле type) -> тип события
+_PUBLICATION_TYPES = {
+    "receive": EventTypes.NEW_MESSAGE,
+    "dialog_read": EventTypes.CHAT_READ,
+    "order_state": EventTypes.ORDER_STATE,
+    "notification": EventTypes.NOTIFICATION,
+}
+
+
+class Frame:
+    """
+    Конверт сообщения вебсокета, разобранный за один проход: тип события, канал и смещение публикации.
+    Полезная нагрузка (data) не разбирается - события строятся из нее только при необходимости.
+
+    :param type: Тип события
+    :type type: :obj:`str`
+
+    :param channel: Канал публикации (для подключения - приватный канал)
+    :type channel: :obj:`str`
+
+    :param offset: Смещение публикации в канале
+    :type offset: :obj:`Optional[int]`
+
+    :param data: Данные публикации (``result.data.data``, для подключения - ``result``)
+    :type data: :obj:`Dict[str, Any]`
+
+    :param message: Сообщение целиком
+    :type message: :obj:`Dict[str, Any]`
+    """
+    __slots__ = ("type", "channel", "offset", "data", "message")
+
+    def __init__(self, type: str, channel: Optional[str], offset: Optional[int], data: Dict[str, Any],
+                 message: Dict[str, Any]):
+        self.type = type
+        self.channel = channel
+        self.offset = offset
+        self.data = data
+        self.message = message
+
+
+def decode(message: Dict[str, Any]) -> Frame:
+    """
+    Определяет тип события и канал сообщения вебсокета.
+
+    :param message: сообщение вебсокета
+    :type message: :obj:`Dict[str, Any]`
+
+    :return: Экземпляр Frame
+    """
+    result = message.get("result") or {}
+    if "client" in result:
+        channel = next((c for c in (result.get("subs") or {}) if "#" in c), None)
+        return Frame(EventTypes.CLIENT_CONNECTION, channel, None, result, message)
+
+    publication = result.get("data") or {}
+    data = publication.get("data") or {}
+    event_type = _PUBLICATION_TYPES.get(data.get("type", ""), "unknown")
+    if event_type == EventTypes.ORDER_STATE and data.get("state") == "paid":
+        event_type = EventTypes.NEW_ORDER
+    return Frame(event_type, result.get("channel", ""), publication.get("offset"), data, message)
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Hashable
+
+
+class EventDeduplicator:
+    """
+    Отсеивает повторно доставленные события (после переподключения, повторной отправки сервером
+    или при нескольких вебсокетах на один аккаунт) по типу и ID события.
+
+    Хранит не больше max_size последних ключей и не дольше ttl секунд, самые старые вытесняются.
+
+    :param max_size: Максимальное количество запомненных событий
+    :type max_size: :obj:`int`
+
+    :param ttl: Время в секундах, в течение которого событие считается повтором (None - без ограничения)
+    :type ttl: :obj:`float`
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0  # Отброшено повторов
+        self.misses = 0  # Пропущено новых событий
+        self.evicted = 0  # Вытеснено ключей по размеру или времени
+
+        self._seen: OrderedDict[Hashable, float] = OrderedDict()
+        self._lock = Lock()
+
+    def is_duplicate(self, event_type: str, event_id: Hashable) -> bool:
+        """
+        Проверяет событие и запоминает его.
+
+        :param event_type: тип события
+        :param event_id: ID события. События без ID не отсеиваются
+
+        :return: True, если событие уже было
+        """
+        if not event_id:
+            return False
+        key = (event_type, event_id)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                self._seen[key] = now
+                self.hits += 1
+                return True
+            self._seen[key] = now
+            self.misses += 1
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+                self.evicted += 1
+            return False
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        # Ключи упорядочены по времени последнего появления, самые старые - в начале
+        while self._seen:
+            key, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.ttl:
+                break
+            del self._seen[key]
+            self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Метрики дедупликации.
+        """
+        with self._lock:
+            return {"size": len(self._seen), "hits": self.hits, "misses": self.misses, "evicted": self.evicted}
@@ -0,0 +1,241 @@
+import logging
+from collections import deque
+from threading import Condition, Thread, current_thread
+from typing import Any, Callable, Dict, Hashable, List, Literal, Optional, Set
+
+logger = logging.getLogger("PaygameAPI")
+
+
+class _Task:
+    __slots__ = ("func", "args", "key", "coalesce_key")
+
+    def __init__(self, func: Callable, args: tuple, key: Optional[Hashable], coalesce_key: Optional[Hashable]):
+        self.func = func
+        self.args = args
+        self.key = key
+        self.coalesce_key = coalesce_key
+
+
+class Dispatcher:
+    """
+    Пул потоков для обработчиков событий с ограниченной очередью.
+
+    Задачи с одинаковым ключом партиции (key) выполняются строго по очереди в порядке поступления,
+    задачи с разными ключами - параллельно.
+
+    Политики переполнения очереди:
+
+    * ``block`` - поток, добавляющий задачу, ждет освобождения места;
+    * ``drop_oldest`` - самая старая задача в очереди выбрасывается;
+    * ``coalesce`` - задача заменяет ожидающую задачу с тем же coalesce_key (актуальным остается последнее событие),
+      если такой задачи нет - поток ждет, как при ``block``.
+
+    :param workers: Количество потоков
+    :type workers: :obj:`int`
+
+    :param max_queue: Максимальное количество задач в очереди
+    :type max_queue: :obj:`int`
+
+    :param overflow: Политика переполнения очереди
+    :type overflow: :obj:`str`
+
+    :param name: Префикс имени потоков
+    :type name: :obj:`str`
+    """
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+
+    def __init__(self, workers: int = 4, max_queue: int = 1000,
+                 overflow: Literal["block", "drop_oldest", "coalesce"] = "block", name: str = "PaygameAPI"):
+        if overflow not in (self.BLOCK, self.DROP_OLDEST, self.COALESCE):
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.name = name
+
+        self.submitted = 0  # Принято задач
+        self.processed = 0  # Выполнено задач
+        self.failed = 0  # Задач, завершившихся исключением
+        self.dropped = 0  # Выброшено задач при переполнении
+        self.coalesced = 0  # Задач, замененных более новыми
+        self.max_depth = 0  # Максимальная глубина очереди
+
+        self._queue: deque[_Task] = deque()  # Задачи, готовые к выполнению
+        self._pending: Dict[Hashable, deque[_Task]] = {}  # Задачи, ждущие завершения задачи с тем же ключом
+        self._busy: Set[Hashable] = set()  # Ключи, задача которых уже в очереди готовых или выполняется
+        self._size = 0
+        self._cond = Condition()
+        self._threads: List[Thread] = []
+        self._active = 0
+        self._running = False
+        self._closed = False  # Остановлен shutdown: задачи не принимаются до явного start
+
+    @property
+    def depth(self) -> int:
+        """
+        Текущее количество задач в очереди (включая ждущие своей партиции).
+        """
+        return self._size
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Метрики диспетчера.
+        """
+        with self._cond:
+            return {
+                "depth": self._size,
+                "max_depth": self.max_depth,
+                "partitions": len(self._busy),
+                "active": self._active,
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+            }
+
+    def start(self):
+        """
+        Запускает потоки. Вызывается автоматически при первой задаче.
+        После :meth:`shutdown` диспетчер снова принимает задачи только после явного вызова.
+        """
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._closed = False
+            self._threads = [Thread(target=self._work, name=f"{self.name}-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, func: Callable, *args: Any, key: Hashable = None, coalesce_key: Hashable = None) -> bool:
+        """
+        Добавляет задачу в очередь.
+
+        :param func: функция
+        :param args: аргументы функции
+        :param key: ключ партиции. Задачи с одним ключом выполняются последовательно
+        :param coalesce_key: ключ для политики ``coalesce``
+
+        :return: False, если задача не была принята (диспетчер остановлен)
+        """
+        if self._closed:
+            return False
+        if not self._running:
+            self.start()
+        task = _Task(func, args, key, coalesce_key)
+        with self._cond:
+            while self._running and self._size >= self.max_queue:
+                if self.overflow == self.DROP_OLDEST:
+                    self._drop_oldest()
+                    break
+                if self.overflow == self.COALESCE and coalesce_key is not None and self._coalesce(task):
+                    return True
+                self._cond.wait()
+            if not self._running:
+                return False
+            if key is None:
+                self._queue.append(task)
+            elif key in self._busy:
+                self._pending.setdefault(key, deque()).append(task)
+            else:
+                self._busy.add(key)
+                self._queue.append(task)
+            self._size += 1
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._size)
+            self._cond.notify_all()
+        return True
+
+    def _release(self, key: Hashable):
+        # Ставит в очередь следующую задачу партиции или освобождает ключ
+        pending = self._pending.get(key)
+        if pending:
+            self._queue.append(pending.popleft())
+            if not pending:
+                del self._pending[key]
+        else:
+            self._busy.discard(key)
+
+    def _drop_oldest(self):
+        if self._queue:
+            task = self._queue.popleft()
+            if task.key is not None:
+                self._release(task.key)
+        else:
+            key, pending = next(iter(self._pending.items()))
+            pending.popleft()
+            if not pending:
+                del self._pending[key]
+        self._size -= 1
+        self.dropped += 1
+
+    def _coalesce(self, task: _Task) -> bool:
+        if task.key is not None:
+            # Чтобы не нарушить порядок внутри партиции, заменить можно только последнюю задачу партиции
+            pending = self._pending.get(task.key)
+            if pending:
+                if pending[-1].coalesce_key != task.coalesce_key:
+                    return False
+                pending[-1] = task
+                self.coalesced += 1
+                return True
+        for i, queued in enumerate(self._queue):
+            if queued.key == task.key and queued.coalesce_key == task.coalesce_key:
+                self._queue[i] = task
+                self.coalesced += 1
+                return True
+        return False
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                task = self._queue.popleft()
+                self._size -= 1
+                self._active += 1
+                self._cond.notify_all()
+            try:
+                task.func(*task.args)
+            except Exception:
+                with self._cond:
+                    self.failed += 1
+                logger.exception("Ошибка в обработчике события")
+            finally:
+                with self._cond:
+                    if task.key is not None:
+                        self._release(task.key)
+                    self._active -= 1
+                    self.processed += 1
+                    self._cond.notify_all()
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Ждет, пока очередь опустеет и все задачи будут выполнены.
+
+        :param timeout: максимальное время ожидания в секундах
+        :return: True, если все задачи выполнены
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._size and not self._active, timeout)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Останавливает потоки. Задачи, уже находящиеся в очереди, будут выполнены, новые не принимаются.
+
+        :param wait: дождаться завершения потоков (кроме текущего, если shutdown вызван из задачи)
+        """
+        with self._cond:
+            self._running = False
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                if thread is not current_thread():
+                    thread.join()
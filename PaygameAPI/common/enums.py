@@ -14,24 +14,9 @@ class EventTypes:
 
     @staticmethod
     def get_type_name(message: Dict[str, Any]) -> 'EventTypes':
-        result = message.get("result", {})
-        data_content = result.get("data", {}).get("data", {})
-        event_type = data_content.get("type", "")
+        from .decoder import decode
 
-        if "client" in result:
-            return EventTypes.CLIENT_CONNECTION
-        elif event_type == "order_state" and data_content.get("state") == "paid":
-            return EventTypes.NEW_ORDER
-        elif event_type == "receive":
-            return EventTypes.NEW_MESSAGE
-        elif event_type == "dialog_read":
-            return EventTypes.CHAT_READ
-        elif event_type == "order_state":
-            return EventTypes.ORDER_STATE
-        elif event_type == "notification":
-            return EventTypes.NOTIFICATION
-        else:
-            return "unknown"
+        return decode(message).type
 
 
 class ORDER_STATES:
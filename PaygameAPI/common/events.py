@@ -1,14 +1,18 @@
+from functools import cached_property
 from typing import List, Dict, Optional, Any
-from datetime import datetime
 from PaygameAPI.types import Message, UserProfile, OrderHistory, Notification, BannedStatus
 from PaygameAPI.common.enums import ORDER_STATES
 from PaygameAPI.common import converters
+from PaygameAPI.common.decoder import Frame, decode
 from PaygameAPI.common.enums import EventTypes
 
 class BaseEvent:
     """
     Базовое событие.
 
+    Тяжелые атрибуты событий (сообщения, профили, даты) строятся из данных вебсокета
+    при первом обращении к ним, а не при получении события.
+
     :param channel: Канал события.
     :type channel: :obj:`str`
 
@@ -26,17 +30,35 @@ class BaseEvent:
         self.channel = channel
         self.event_type = event_type
         self.event_id = event_id
-        self.items = items or {}
+        if items is not None:
+            self.items = items
+
+    @cached_property
+    def items(self) -> Dict[str, Any]:
+        return self._build_items()
+
+    def _build_items(self) -> Dict[str, Any]:
+        return {}
+
+    @property
+    def partition_key(self) -> Optional[tuple]:
+        """
+        Ключ, по которому события упорядочиваются при параллельной обработке:
+        события с одинаковым ключом обрабатываются строго по порядку поступления. None - порядок не важен.
+        """
+        return None
 
     @classmethod
     def from_json(cls, data: Dict[str, any]) -> 'BaseEvent':
-        result = data.get("result", {})
-        channel = result.get("channel", "")
-        data_content = result.get("data", {}).get("data", {})
-        event_type = data_content.get("type", "")
-        items = data_content.get("items", {})
-        event_id = items.get("id", 0)
-        return cls(channel, event_type, event_id, items)
+        return cls.from_frame(decode(data))
+
+    @classmethod
+    def from_frame(cls, frame: Frame) -> 'BaseEvent':
+        """
+        Создает событие из уже разобранного конверта сообщения (см. :func:`decoder.decode`).
+        """
+        items = frame.data.get("items", {})
+        return cls(frame.channel, frame.data.get("type", ""), items.get("id", 0), items)
 
 
 class NewMessageEvent(BaseEvent):
@@ -50,32 +72,30 @@ class NewMessageEvent(BaseEvent):
     :type dialogs_unreaded: :obj:`List[int]`
     """
 
-    def __init__(self, channel: str, event_type: str, event_id: int, message: Message, dialogs_unreaded: List[int]):
-        super().__init__(channel, event_type, event_id,
-                         items={"message": message, "dialogs_unreaded": dialogs_unreaded})
-        self.message = message
-        self.dialogs_unreaded = dialogs_unreaded
-
-    @classmethod
-    def from_json(cls, data: Dict[str, any]) -> 'NewMessageEvent':
-        result = data.get("result", {})
-        channel = result.get("channel", "")
-        data_content = result.get("data", {}).get("data", {})
-        event_type = data_content.get("type", "")
-        items = data_content.get("items", {})
-        event_id = items.get("id", 0)
-
+    def __init__(self, channel: str, event_type: str, event_id: int, message: Message = None,
+                 dialogs_unreaded: List[int] = None):
+        super().__init__(channel, event_type, event_id)
+        self._raw: Dict[str, Any] = {}
+        if message is not None:
+            self.message = message
+        if dialogs_unreaded is not None:
+            self.dialogs_unreaded = dialogs_unreaded
+
+    @cached_property
+    def message(self) -> Message:
+        items = self._raw
         sender_data = items.get("sender", {})
         banned = sender_data.get("banned")
+        # Отсутствующие в событии поля остаются None, чтобы частичный профиль не затирал их в кэше профилей
         sender = UserProfile(
-            username=sender_data.get("username", ""),
+            username=sender_data.get("username"),
             avatar=sender_data.get("avatar"),
-            id=sender_data.get("id", 0),
-            is_active=sender_data.get("is_active", False),
-            is_support=sender_data.get("is_support", False),
-            banned=BannedStatus(banned.get("freeze", False), banned.get("ban", False))
+            id=sender_data.get("id"),
+            is_active=sender_data.get("is_active"),
+            is_support=sender_data.get("is_support"),
+            banned=BannedStatus(banned.get("freeze") or {}, banned.get("ban") or {}) if banned else None
         )
-        message = Message(
+        return Message(
             id=items.get("id", 0),
             sender=sender,
             created_date=items.get("created_date", ""),
@@ -88,9 +108,33 @@ class NewMessageEvent(BaseEvent):
             removed=items.get("removed", False),
             distrust=items.get("distrust")
         )
-        dialogs_unreaded = items.get("dialogs_unreaded", [])
 
-        return cls(channel, event_type, event_id, message, dialogs_unreaded)
+    @cached_property
+    def dialogs_unreaded(self) -> List[int]:
+        return self._raw.get("dialogs_unreaded", [])
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """
+        Данные сообщения из вебсокета в исходном виде.
+        """
+        return self._raw
+
+    def _build_items(self) -> Dict[str, Any]:
+        return {"message": self.message, "dialogs_unreaded": self.dialogs_unreaded}
+
+    @property
+    def partition_key(self) -> tuple:
+        if "message" in self.__dict__ or "peer" not in self._raw:
+            return "chat", self.message.chat_id
+        return "chat", self._raw["peer"]
+
+    @classmethod
+    def from_frame(cls, frame: Frame) -> 'NewMessageEvent':
+        items = frame.data.get("items", {})
+        event = cls(frame.channel, frame.data.get("type", ""), items.get("id", 0))
+        event._raw = items
+        return event
 
 
 class ChatReadEvent(BaseEvent):
@@ -110,17 +154,17 @@ class ChatReadEvent(BaseEvent):
         self.conversation_id = conversation_id
         self.read_message_id = read_message_id
 
+    @property
+    def partition_key(self) -> tuple:
+        return "chat", self.conversation_id
+
     @classmethod
-    def from_json(cls, data: Dict[str, any]) -> 'ChatReadEvent':
-        result = data.get("result", {})
-        channel = result.get("channel", "")
-        data_content = result.get("data", {}).get("data", {})
-        event_type = data_content.get("type", "")
-        items = data_content.get("items", {})
+    def from_frame(cls, frame: Frame) -> 'ChatReadEvent':
+        items = frame.data.get("items", {})
         conversation_id = items.get("conversation_id", 0)
         read_message_id = items.get("id", 0)
 
-        return cls(channel, event_type, read_message_id, conversation_id, read_message_id)
+        return cls(frame.channel, frame.data.get("type", ""), read_message_id, conversation_id, read_message_id)
 
 
 class OrderStateChangeEvent(BaseEvent):
@@ -143,42 +187,52 @@ class OrderStateChangeEvent(BaseEvent):
     :type sales: :obj:`int`
     """
 
-    def __init__(self, channel: str, event_type: str, event_id: int, state: str, order_id: str, history: OrderHistory,
-                 purchases: int, sales: int):
-        super().__init__(channel, event_type, event_id, items={
-            "state": state,
-            "order_id": order_id,
-            "history": history,
-            "orders": {
-                "purchases": purchases,
-                "sales": sales
-            }
-        })
+    def __init__(self, channel: str, event_type: str, event_id: int, state: str, order_id: str,
+                 history: OrderHistory = None, purchases: int = 0, sales: int = 0):
+        super().__init__(channel, event_type, event_id)
+        self._raw_state = state
+        self._raw_history: Dict[str, Any] = {}
         self.state = ORDER_STATES.from_str(state)
         self.order_id = order_id
-        self.history = history
+        if history is not None:
+            self.history = history
         self.purchases = purchases
         self.sales = sales
 
-    @classmethod
-    def from_json(cls, data: Dict[str, Any]) -> 'OrderStateChangeEvent':
-        result = data.get("result", {})
-        channel = result.get("channel", "")
-        data_content = result.get("data", {}).get("data", {})
-        event_type = data_content.get("type", "")
-        state = data_content.get("state", "")
-        order_id = data_content.get("order_id", "")
-        history_data = data_content.get("history", {})
-        history = OrderHistory(
+    @cached_property
+    def history(self) -> OrderHistory:
+        history_data = self._raw_history
+        return OrderHistory(
             id=history_data.get("id", 0),
             state=history_data.get("state", ""),
-            created_date=datetime.fromisoformat(history_data.get("created_date", ""))
+            created_date=history_data.get("created_date")
         )
-        orders = data_content.get("orders", {})
-        purchases = orders.get("purchases", 0)
-        sales = orders.get("sales", 0)
 
-        return cls(channel, event_type, history.id, state, order_id, history, purchases, sales)
+    def _build_items(self) -> Dict[str, Any]:
+        return {
+            "state": self._raw_state,
+            "order_id": self.order_id,
+            "history": self.history,
+            "orders": {
+                "purchases": self.purchases,
+                "sales": self.sales
+            }
+        }
+
+    @property
+    def partition_key(self) -> tuple:
+        return "order", self.order_id
+
+    @classmethod
+    def from_frame(cls, frame: Frame) -> 'OrderStateChangeEvent':
+        data_content = frame.data
+        history_data = data_content.get("history", {})
+        orders = data_content.get("orders", {})
+        event = cls(frame.channel, data_content.get("type", ""), history_data.get("id", 0),
+                    data_content.get("state", ""), data_content.get("order_id", ""),
+                    purchases=orders.get("purchases", 0), sales=orders.get("sales", 0))
+        event._raw_history = history_data
+        return event
 
 
 class NotificationEvent(BaseEvent):
@@ -192,24 +246,20 @@ class NotificationEvent(BaseEvent):
     :type notices: :obj:`int`
     """
 
-    def __init__(self, channel: str, event_type: str, event_id: int, notification: Notification, notices: int):
-        super().__init__(channel, event_type, event_id, items={
-            "notification": notification,
-            "notices": notices
-        })
-        self.notification = notification
+    def __init__(self, channel: str, event_type: str, event_id: int, notification: Notification = None,
+                 notices: int = 0):
+        super().__init__(channel, event_type, event_id)
+        self._raw: Dict[str, Any] = {}
+        if notification is not None:
+            self.notification = notification
         self.notices = notices
 
-    @classmethod
-    def from_json(cls, data: Dict[str, Any]) -> 'NotificationEvent':
-        result = data.get("result", {})
-        channel = result.get("channel", "")
-        data_content = result.get("data", {}).get("data", {})
-        event_type = data_content.get("type", "")
-        notification_data = data_content.get("data", {})
-        notification = Notification(
+    @cached_property
+    def notification(self) -> Notification:
+        notification_data = self._raw
+        return Notification(
             is_read=notification_data.get("is_read", False),
-            created_date=datetime.fromisoformat(notification_data.get("created_date", "")),
+            created_date=notification_data.get("created_date"),
             uuid_id=notification_data.get("uuid_id", ""),
             verb=notification_data.get("verb", ""),
             content_id=notification_data.get("content_id", ""),
@@ -217,9 +267,21 @@ class NotificationEvent(BaseEvent):
             date_of_reading=notification_data.get("date_of_reading", None),
             meta=notification_data.get("meta", "")
         )
-        notices = data_content.get("notices", 0)
 
-        return cls(channel, event_type, notification.uuid_id, notification, notices)
+    def _build_items(self) -> Dict[str, Any]:
+        return {
+            "notification": self.notification,
+            "notices": self.notices
+        }
+
+    @classmethod
+    def from_frame(cls, frame: Frame) -> 'NotificationEvent':
+        data_content = frame.data
+        notification_data = data_content.get("data", {})
+        event = cls(frame.channel, data_content.get("type", ""), notification_data.get("uuid_id", ""),
+                    notices=data_content.get("notices", 0))
+        event._raw = notification_data
+        return event
 
 
 class ClientConnectionEvent(BaseEvent):
@@ -258,15 +320,14 @@ class ClientConnectionEvent(BaseEvent):
         self.subs = subs
 
     @classmethod
-    def from_json(cls, data: Dict[str, Any]) -> 'ClientConnectionEvent':
-        result = data.get("result", {})
-        private_channel = next((c for c in list(result.get("subs").keys()) if "#" in c), None)
+    def from_frame(cls, frame: Frame) -> 'ClientConnectionEvent':
+        result = frame.data
         event_type = "client_connection"
-        event_id = data.get("id", 1)
+        event_id = frame.message.get("id", 1)
         client = result.get("client", "")
         version = result.get("version", "")
         expires = result.get("expires", False)
         ttl = result.get("ttl", 0)
         subs = result.get("subs", {})
 
-        return cls(private_channel, event_type, event_id, client, version, expires, ttl, subs)
+        return cls(frame.channel, event_type, event_id, client, version, expires, ttl, subs)
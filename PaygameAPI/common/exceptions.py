@@ -1,11 +1,14 @@
-import requests
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
 
 
 class RequestFailedError(Exception):
     """
     Исключение, которое возбуждается, если статус код ответа != 200.
     """
-    def __init__(self, response: requests.Response):
+    def __init__(self, response: 'requests.Response'):
         """
         :param response: объект ответа.
         """
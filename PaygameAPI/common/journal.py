@@ -0,0 +1,416 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from threading import Condition, Lock, Thread
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+logger = logging.getLogger("PaygameAPI")
+
+# Заголовок записи: длина данных, crc32 данных, порядковый номер
+_HEADER = struct.Struct("<IIQ")
+_EMPTY_HEADER = bytes(_HEADER.size)
+
+
+class _Segment:
+    """
+    Файл журнала фиксированного размера, отображенный в память. Имя файла - номер первой записи.
+    Сегмент, открытый с readonly=True, отображается только для чтения и не меняет размер файла.
+    """
+
+    def __init__(self, path: str, first_seq: int, size: int, readonly: bool = False):
+        self.path = path
+        self.first_seq = first_seq
+        self.last_seq = first_seq - 1
+        self.position = 0
+
+        if readonly:
+            self.file = open(path, "rb")
+            self.size = os.path.getsize(path)
+            self.mm = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+            return
+        exists = os.path.exists(path)
+        self.file = open(path, "r+b" if exists else "w+b")
+        if not exists or os.path.getsize(path) < size:
+            self.file.truncate(size)
+        self.size = os.path.getsize(path)
+        self.mm = mmap.mmap(self.file.fileno(), self.size)
+
+    def records(self) -> Iterable[Tuple[int, bytes]]:
+        """
+        Читает записи до первой пустой или поврежденной (например, недописанной при падении процесса).
+        """
+        mm = self.mm
+        position = 0
+        expected = self.first_seq
+        while position + _HEADER.size <= self.size:
+            length, crc, seq = _HEADER.unpack_from(mm, position)
+            end = position + _HEADER.size + length
+            if not length or seq != expected or end > self.size:
+                break
+            payload = mm[position + _HEADER.size:end]
+            if zlib.crc32(payload) != crc:
+                break
+            yield seq, payload
+            position = end
+            expected += 1
+            self.last_seq = seq
+            self.position = position
+
+    def fits(self, length: int) -> bool:
+        return self.position + _HEADER.size + length <= self.size
+
+    def write(self, seq: int, payload: bytes):
+        position = self.position
+        _HEADER.pack_into(self.mm, position, len(payload), zlib.crc32(payload), seq)
+        end = position + _HEADER.size + len(payload)
+        self.mm[position + _HEADER.size:end] = payload
+        # Затираем заголовок следующей записи, чтобы старые данные не прочитались после записи поверх них
+        if end + _HEADER.size <= self.size:
+            self.mm[end:end + _HEADER.size] = _EMPTY_HEADER
+        self.position = end
+        self.last_seq = seq
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        self.mm.flush()
+        self.mm.close()
+        self.file.close()
+
+
+class EventJournal:
+    """
+    Журнал событий вебсокета с подтверждением обработки (at-least-once).
+
+    Сообщение записывается в журнал до передачи обработчикам, вместе с именами обработчиков,
+    которые должны его получить. Каждый обработчик подтверждает запись после выполнения.
+    При следующем запуске неподтвержденные записи возвращаются методом :meth:`pending`
+    и передаются только тем обработчикам, которые их не подтвердили.
+
+    Журнал состоит из сегментов фиксированного размера, отображенных в память. Сброс на диск
+    выполняется фоновым потоком раз в flush_interval секунд или после flush_every записей,
+    а не после каждой записи. Полностью обработанные сегменты удаляются.
+
+    Запись, обработчик которой завершился ошибкой (после retries повторов, см. :meth:`Bot._run_handlers`),
+    сохраняется в файл необработанных событий (:meth:`fail`) и подтверждается, чтобы не задерживать
+    удаление сегментов.
+
+    :param path: Директория журнала
+    :type path: :obj:`str`
+
+    :param segment_size: Размер сегмента в байтах
+    :type segment_size: :obj:`int`
+
+    :param flush_interval: Максимальное время в секундах между записью и сбросом на диск
+    :type flush_interval: :obj:`float`
+
+    :param flush_every: Количество записей, после которого сброс выполняется не дожидаясь интервала
+    :type flush_every: :obj:`int`
+
+    :param retries: Количество повторов обработчика, завершившегося ошибкой
+    :type retries: :obj:`int`
+
+    :param retry_delay: Задержка перед первым повтором в секундах (удваивается с каждым повтором)
+    :type retry_delay: :obj:`float`
+    """
+    CHECKPOINT = "checkpoint.json"
+    DEAD_LETTERS = "dead_letters.jsonl"
+
+    def __init__(self, path: str, segment_size: int = 16 * 1024 * 1024, flush_interval: float = 0.05,
+                 flush_every: int = 512, retries: int = 2, retry_delay: float = 0.5):
+        self.path = path
+        self.segment_size = segment_size
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self.appended = 0  # Записано сообщений
+        self.acked = 0  # Полностью обработано записей
+        self.flushes = 0  # Сбросов на диск
+        self.failed = 0  # Записей, переданных в файл необработанных событий
+
+        # Номер записи -> [количество обработчиков, обработчики, еще не подтвердившие запись, сообщение]
+        self._remaining: Dict[int, List[Any]] = {}
+        # Полностью обработанные записи с номером больше low (обработанные раньше более старых)
+        self._done: Set[int] = set()
+        self._pending: List[Tuple[int, Dict[str, Any], Set[str]]] = []
+        self._unflushed = 0
+        self._checkpoint_dirty = False
+        self._cond = Condition()
+        # Запись на диск (сброс сегмента, контрольная точка, файл необработанных событий) выполняется
+        # без self._cond, чтобы append и ack не ждали диск. Блокировка сохраняет порядок контрольных точек
+        self._io_lock = Lock()
+        self._closed = False
+
+        os.makedirs(path, exist_ok=True)
+        self._low = self._load_checkpoint()
+        self._segments: List[_Segment] = []
+        self._seq = self._low
+        self._open()
+
+        self._flusher = Thread(target=self._flush_loop, name="PaygameAPI-journal", daemon=True)
+        self._flusher.start()
+
+    @property
+    def low(self) -> int:
+        """
+        Номер записи, до которой включительно все записи обработаны.
+        """
+        return self._low
+
+    @property
+    def seq(self) -> int:
+        """
+        Номер последней записи.
+        """
+        return self._seq
+
+    def _load_checkpoint(self) -> int:
+        self._saved: Dict[int, Set[str]] = {}
+        try:
+            with open(os.path.join(self.path, self.CHECKPOINT), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        self._saved = {int(seq): set(names) for seq, names in data.get("remaining", {}).items()}
+        self._done = set(data.get("done", ()))
+        return data.get("low", 0)
+
+    def _open(self):
+        names = sorted(n for n in os.listdir(self.path) if n.endswith(".log"))
+        for name in names:
+            segment = _Segment(os.path.join(self.path, name), int(name[:-4]), self.segment_size)
+            for seq, payload in segment.records():
+                if seq <= self._low or seq in self._done:
+                    continue
+                record = json.loads(payload)
+                remaining = self._saved.get(seq, set(record["h"]))
+                if remaining:
+                    self._remaining[seq] = [len(record["h"]), set(remaining), record["m"]]
+                    self._pending.append((seq, record["m"], set(remaining)))
+            if segment.last_seq >= segment.first_seq:
+                self._seq = max(self._seq, segment.last_seq)
+            self._segments.append(segment)
+        self._saved = {}
+        if not self._segments:
+            self._segments.append(self._new_segment(self._seq + 1, 0))
+        self._advance_low()
+        self._checkpoint_dirty = True
+
+    def _new_segment(self, first_seq: int, length: int) -> _Segment:
+        size = max(self.segment_size, _HEADER.size * 2 + length)
+        return _Segment(os.path.join(self.path, f"{first_seq:020d}.log"), first_seq, size)
+
+    def append(self, message: Dict[str, Any], handlers: Iterable[str]) -> int:
+        """
+        Записывает сообщение вебсокета.
+
+        :param message: сообщение вебсокета
+        :param handlers: имена обработчиков, которые должны подтвердить запись
+
+        :return: номер записи
+        """
+        handlers = list(handlers)
+        payload = json.dumps({"h": handlers, "m": message}, ensure_ascii=False, separators=(",", ":")).encode()
+        with self._cond:
+            seq = self._seq + 1
+            segment = self._segments[-1]
+            if not segment.fits(len(payload)):
+                segment.flush()
+                segment = self._new_segment(seq, len(payload))
+                self._segments.append(segment)
+                self._drop_segments()
+            segment.write(seq, payload)
+            self._seq = seq
+            if handlers:
+                self._remaining[seq] = [len(handlers), set(handlers), message]
+            else:
+                self._advance_low()
+            self.appended += 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._cond.notify_all()
+        return seq
+
+    def ack(self, seq: int, *handlers: str):
+        """
+        Подтверждает обработку записи обработчиками.
+
+        :param seq: номер записи
+        :param handlers: имена обработчиков
+        """
+        with self._cond:
+            entry = self._remaining.get(seq)
+            if entry is None:
+                return
+            entry[1].difference_update(handlers)
+            if not entry[1]:
+                del self._remaining[seq]
+                self.acked += 1
+                self._done.add(seq)
+                self._advance_low()
+            self._checkpoint_dirty = True
+
+    def fail(self, seq: int, handler: str, error: BaseException):
+        """
+        Сохраняет запись, которую обработчик не смог обработать, в файл необработанных событий
+        и подтверждает ее за этот обработчик.
+
+        :param seq: номер записи
+        :param handler: имя обработчика
+        :param error: исключение обработчика
+        """
+        with self._cond:
+            entry = self._remaining.get(seq)
+            if entry is None or handler not in entry[1]:
+                return
+            message = entry[2]
+            self.failed += 1
+        line = json.dumps({"seq": seq, "handler": handler, "error": repr(error), "message": message},
+                          ensure_ascii=False, separators=(",", ":"))
+        with self._io_lock:
+            with open(os.path.join(self.path, self.DEAD_LETTERS), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        self.ack(seq, handler)
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """
+        Записи из файла необработанных событий.
+
+        :return: список словарей с ключами seq, handler, error и message (сообщение вебсокета)
+        """
+        try:
+            with open(os.path.join(self.path, self.DEAD_LETTERS), encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _advance_low(self):
+        # Записи добавляются по возрастанию номера, поэтому первая в словаре - самая старая необработанная
+        low = next(iter(self._remaining)) - 1 if self._remaining else self._seq
+        if low != self._low and self._done:
+            self._done = {seq for seq in self._done if seq > low}
+        self._low = low
+
+    def _drop_segments(self):
+        # Удаляет сегменты, все записи которых обработаны (кроме текущего)
+        while len(self._segments) > 1 and self._segments[1].first_seq <= self._low + 1:
+            segment = self._segments.pop(0)
+            segment.close()
+            os.remove(segment.path)
+
+    def pending(self) -> List[Tuple[int, Dict[str, Any], Set[str]]]:
+        """
+        Записи, не подтвержденные до предыдущей остановки.
+
+        :return: список (номер записи, сообщение вебсокета, имена обработчиков, не подтвердивших запись)
+        """
+        pending, self._pending = self._pending, []
+        return pending
+
+    def flush(self):
+        """
+        Сбрасывает записи и контрольную точку на диск.
+        """
+        with self._io_lock:
+            # Под self._cond только копируется состояние, запись на диск - после освобождения
+            with self._cond:
+                segment = self._segments[-1] if self._unflushed and self._segments else None
+                self._unflushed = 0
+                checkpoint = self._checkpoint() if self._checkpoint_dirty else None
+                self._checkpoint_dirty = False
+            if segment is not None:
+                try:
+                    segment.flush()
+                except ValueError:
+                    pass  # Сегмент уже закрыт при смене сегмента, при закрытии он был сброшен на диск
+                self.flushes += 1
+            if checkpoint is not None:
+                try:
+                    self._write_checkpoint(checkpoint)
+                except BaseException:
+                    with self._cond:
+                        self._checkpoint_dirty = True
+                    raise
+
+    def _checkpoint(self) -> Dict[str, Any]:
+        # Частично подтвержденные записи сохраняются с оставшимися обработчиками
+        remaining = {str(seq): sorted(entry[1]) for seq, entry in self._remaining.items()
+                     if len(entry[1]) < entry[0]}
+        return {"low": self._low, "remaining": remaining, "done": sorted(self._done)}
+
+    def _write_checkpoint(self, checkpoint: Dict[str, Any]):
+        path = os.path.join(self.path, self.CHECKPOINT)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._unflushed >= self.flush_every,
+                                    self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка при сбросе журнала событий на диск")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Метрики журнала.
+        """
+        with self._cond:
+            return {
+                "seq": self._seq,
+                "low": self._low,
+                "in_flight": len(self._remaining),
+                "segments": len(self._segments),
+                "appended": self.appended,
+                "acked": self.acked,
+                "failed": self.failed,
+                "flushes": self.flushes,
+            }
+
+    def close(self):
+        """
+        Сбрасывает данные на диск и закрывает журнал.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self.flush()
+        with self._cond:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Читает все сообщения вебсокета из журнала по порядку, не открывая его на запись.
+    Пустые файлы сегментов (например, созданные перед падением процесса) пропускаются.
+
+    :param path: директория журнала
+    """
+    for name in sorted(n for n in os.listdir(path) if n.endswith(".log")):
+        if not os.path.getsize(os.path.join(path, name)):
+            continue
+        segment = _Segment(os.path.join(path, name), int(name[:-4]), 0, readonly=True)
+        try:
+            for _, payload in segment.records():
+                yield json.loads(payload)["m"]
+        finally:
+            segment.close()
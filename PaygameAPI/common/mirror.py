@@ -0,0 +1,259 @@
+import json
+import logging
+from collections import OrderedDict
+from threading import Condition, Lock, RLock, Thread
+from typing import Any, Dict, List, Optional, Set
+
+from . import converters
+from .events import BaseEvent, ChatReadEvent, NewMessageEvent
+from ..types import Chat, ChatList
+
+logger = logging.getLogger("PaygameAPI")
+
+# Поля сообщения, которых может не быть в событии вебсокета, но которые обязательны для converters.parse_message
+_MESSAGE_DEFAULTS = {"created_date": "", "text": "", "type": "", "service_type": "", "removed": False, "media": []}
+
+
+class ChatMirror:
+    """
+    Локальная копия списка чатов. Заполняется один раз ответом API (:meth:`seed`), а затем обновляется
+    событиями вебсокета (новые сообщения и прочтения чатов), так что чтение списка чатов
+    и непрочитанных диалогов не требует запросов.
+
+    Чаты хранятся в исходном JSON и преобразуются в объекты Chat при первом чтении после изменения.
+
+    Изменения сохраняются в базу фоновым потоком одной транзакцией раз в commit_interval секунд
+    или после commit_every измененных чатов, а не после каждого события.
+
+    :param path: Путь к базе SQLite для сохранения копии между перезапусками (None - только в памяти)
+    :type path: :obj:`str`
+
+    :param me_id: ID текущего аккаунта. Его собственные сообщения не делают чат непрочитанным при заполнении
+    :type me_id: :obj:`int`
+
+    :param commit_interval: Максимальное время в секундах между изменением и сохранением в базу
+    :type commit_interval: :obj:`float`
+
+    :param commit_every: Количество измененных чатов, после которого сохранение выполняется не дожидаясь интервала
+    :type commit_every: :obj:`int`
+    """
+
+    def __init__(self, path: str = None, me_id: int = None, commit_interval: float = 1.0, commit_every: int = 100):
+        self.path = path
+        self.me_id = me_id
+        self.commit_interval = commit_interval
+        self.commit_every = commit_every
+        self.seeded = False
+
+        self._chats: OrderedDict[int, Dict[str, Any]] = OrderedDict()  # Последний - самый свежий
+        self._parsed: Dict[int, Chat] = {}
+        self._unread: Set[int] = set()
+        self._position = 0
+        self._lock = RLock()
+
+        # ID чата -> позиция: чаты, измененные после последнего сохранения
+        self._dirty: Dict[int, int] = {}
+        self._state_dirty = False
+        self._reset = False  # Перед сохранением нужно очистить таблицу чатов (после seed)
+        self._cond = Condition(self._lock)
+        self._db_lock = Lock()
+        self._closed = False
+
+        self._db = None
+        self._flusher = None
+        if path:
+            import sqlite3
+
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS chats (id INTEGER PRIMARY KEY, position INTEGER, data TEXT)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+            self._load()
+            self._flusher = Thread(target=self._flush_loop, name="PaygameAPI-mirror", daemon=True)
+            self._flusher.start()
+
+    def _load(self):
+        for chat_id, position, data in self._db.execute("SELECT id, position, data FROM chats ORDER BY position"):
+            self._chats[chat_id] = json.loads(data)
+            self._position = max(self._position, position)
+        for key, value in self._db.execute("SELECT key, value FROM state"):
+            if key == "unread":
+                self._unread = set(json.loads(value))
+            elif key == "seeded":
+                self.seeded = json.loads(value)
+
+    def _save(self, *chat_ids: int):
+        # Вызывается под self._lock: только отмечает изменения, запись выполняет flush
+        if self._db is None:
+            return
+        for chat_id in chat_ids:
+            self._position += 1
+            self._dirty[chat_id] = self._position
+        self._state_dirty = True
+        if len(self._dirty) >= self.commit_every:
+            self._cond.notify_all()
+
+    def flush(self):
+        """
+        Сохраняет накопленные изменения в базу одной транзакцией.
+        """
+        with self._db_lock:
+            # Под self._lock только копируются изменения, запись в базу - после освобождения
+            with self._lock:
+                if self._db is None or not (self._dirty or self._state_dirty):
+                    return
+                rows = [(chat_id, position, json.dumps(self._chats[chat_id], ensure_ascii=False))
+                        for chat_id, position in self._dirty.items()]
+                state = [("unread", json.dumps(sorted(self._unread))), ("seeded", json.dumps(self.seeded))]
+                reset = self._reset
+                self._dirty, self._state_dirty, self._reset = {}, False, False
+            with self._db:
+                if reset:
+                    self._db.execute("DELETE FROM chats")
+                self._db.executemany("INSERT OR REPLACE INTO chats (id, position, data) VALUES (?, ?, ?)", rows)
+                self._db.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", state)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._dirty) >= self.commit_every,
+                                    self.commit_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка при сохранении копии чатов")
+
+    def seed(self, data: Dict[str, Any]):
+        """
+        Заполняет копию ответом API со списком чатов (см. :func:`apihelper.get_messager`), заменяя прежнее содержимое.
+
+        :param data: JSON ответа
+        """
+        results = data.get("results", [])
+        with self._lock:
+            self._chats.clear()
+            self._parsed.clear()
+            self._unread.clear()
+            # API отдает чаты от новых к старым, храним от старых к новым
+            for chat in reversed(results):
+                self._chats[chat["id"]] = chat
+                last_message = chat.get("last_message") or {}
+                sender_id = (last_message.get("sender") or {}).get("id")
+                if (last_message.get("id") and last_message["id"] > (chat.get("last_read") or 0)
+                        and (self.me_id is None or sender_id != self.me_id)):
+                    self._unread.add(chat["id"])
+            self.seeded = True
+            self._dirty.clear()
+            self._reset = True
+            self._save(*self._chats)
+        self.flush()
+
+    def apply(self, event: BaseEvent):
+        """
+        Обновляет копию событием вебсокета. События других типов игнорируются.
+
+        :param event: событие
+        """
+        if isinstance(event, NewMessageEvent):
+            self._apply_message(event)
+        elif isinstance(event, ChatReadEvent):
+            self._apply_read(event)
+
+    def _apply_message(self, event: NewMessageEvent):
+        message = {**_MESSAGE_DEFAULTS, **event.data}
+        message.pop("dialogs_unreaded", None)
+        chat_id = message.get("peer")
+        with self._lock:
+            chat = self._chats.pop(chat_id, None)
+            if chat is None:
+                # Чат, которого не было в списке: известны только отправитель и последнее сообщение
+                chat = {"id": chat_id, "count": 0, "users": [message["sender"]] if message.get("sender") else []}
+            chat = {**chat, "last_message": message, "count": (chat.get("count") or 0) + 1}
+            self._chats[chat_id] = chat
+            self._parsed.pop(chat_id, None)
+            if "dialogs_unreaded" in event.data:
+                self._unread = set(event.dialogs_unreaded)
+            elif self.me_id is None or (message.get("sender") or {}).get("id") != self.me_id:
+                self._unread.add(chat_id)
+            self._save(chat_id)
+
+    def _apply_read(self, event: ChatReadEvent):
+        chat_id = event.conversation_id
+        with self._lock:
+            self._unread.discard(chat_id)
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                self._save()
+                return
+            self._chats[chat_id] = {**chat, "last_read": event.read_message_id}
+            self._parsed.pop(chat_id, None)
+            self._save(chat_id)
+
+    def _parse(self, chat_id: int) -> Chat:
+        chat = self._parsed.get(chat_id)
+        if chat is None:
+            data = self._chats[chat_id]
+            chat = self._parsed[chat_id] = converters.parse_chat_list({"results": [data]}).results[0] \
+                if data.get("last_message") else Chat(
+                    id=chat_id, count=data.get("count"), uid=data.get("uid"), last_read=data.get("last_read"),
+                    users=[converters.parse_user_profile(u) for u in data.get("users", [])])
+        return chat
+
+    def get(self, chat_id: int) -> Optional[Chat]:
+        """
+        Возвращает чат по ID.
+
+        :return: Экземпляр Chat или None, если чата нет в копии
+        """
+        with self._lock:
+            return self._parse(chat_id) if chat_id in self._chats else None
+
+    def chats(self) -> List[Chat]:
+        """
+        Все чаты, от новых к старым.
+        """
+        with self._lock:
+            return [self._parse(chat_id) for chat_id in reversed(self._chats)]
+
+    def chat_list(self) -> ChatList:
+        """
+        Список чатов в том же виде, что возвращает :meth:`Bot.get_chats`.
+        """
+        results = self.chats()
+        return ChatList(count=len(results), next=None, previous=None, results=results)
+
+    @property
+    def unread_ids(self) -> Set[int]:
+        """
+        ID непрочитанных чатов.
+        """
+        with self._lock:
+            return set(self._unread)
+
+    def unread(self) -> List[Chat]:
+        """
+        Непрочитанные чаты, от новых к старым.
+        """
+        with self._lock:
+            return [self._parse(chat_id) for chat_id in reversed(self._chats) if chat_id in self._unread]
+
+    def __len__(self):
+        return len(self._chats)
+
+    def close(self):
+        """
+        Сохраняет накопленные изменения и закрывает базу.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,181 @@
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .enums import ORDER_STATES
+from .events import BaseEvent, OrderStateChangeEvent
+from ..types import Order, OrderHistory
+
+
+def _state_name(state: str | int) -> str:
+    return ORDER_STATES.state_name(state) if isinstance(state, int) else state
+
+
+class OrderStore:
+    """
+    Локальное хранилище заказов. Подробности заказа запрашиваются один раз (или если нужного поля нет),
+    после чего статус и история заказа обновляются событиями :class:`OrderStateChangeEvent` на месте.
+    Индекс по статусам позволяет получать все заказы в нужном статусе без запросов.
+    """
+
+    def __init__(self):
+        self.fetches = 0  # Запросов подробностей заказа
+        self.hits = 0  # Заказов, отданных без запроса
+        self.applied = 0  # Примененных событий
+
+        self._orders: Dict[str, Order] = {}
+        self._states: Dict[str, str] = {}  # ID заказа -> статус, в том числе для заказов без подробностей
+        self._by_state: Dict[str, Set[str]] = {}
+        self._last_history: Dict[str, int] = {}  # ID заказа -> ID последней примененной записи истории
+        self._lock = Lock()
+        self._fetch_locks: Dict[str, Lock] = {}
+
+    def _set_state(self, order_id: str, state: str):
+        old = self._states.get(order_id)
+        if old == state:
+            return
+        if old is not None:
+            ids = self._by_state.get(old)
+            if ids is not None:
+                ids.discard(order_id)
+                if not ids:
+                    del self._by_state[old]
+        self._states[order_id] = state
+        self._by_state.setdefault(state, set()).add(order_id)
+
+    def apply(self, event: BaseEvent):
+        """
+        Применяет изменение статуса заказа. События других типов игнорируются.
+
+        :param event: событие
+        """
+        if not isinstance(event, OrderStateChangeEvent) or not event.order_id:
+            return
+        state = _state_name(event.state) if event.state is not None else event.items["state"]
+        history_id = event.event_id or 0
+        with self._lock:
+            if history_id and history_id <= self._last_history.get(event.order_id, 0):
+                return  # Событие старше уже примененного
+            if history_id:
+                self._last_history[event.order_id] = history_id
+            self._set_state(event.order_id, state)
+            order = self._orders.get(event.order_id)
+            if order is not None:
+                order.state = state
+                if history_id and all(h.id != history_id for h in order.order_history or ()):
+                    history = event.history
+                    if not history.state:
+                        # Исходная строка даты копируется как есть, чтобы не разбирать ленивое поле created_date
+                        history = OrderHistory(history.id, state, history._created_date)
+                    order.order_history = [*(order.order_history or ()), history]
+            self.applied += 1
+
+    def put(self, order: Order) -> Order:
+        """
+        Сохраняет заказ, полученный из API. Если события успели сообщить более новый статус, он сохраняется.
+
+        :param order: заказ
+        :return: сохраненный заказ
+        """
+        with self._lock:
+            history_ids = [h.id for h in order.order_history or () if h.id]
+            fetched = max(history_ids, default=0)
+            if self._last_history.get(order.order_id, 0) > fetched:
+                order.state = self._states.get(order.order_id, order.state)
+            else:
+                self._last_history[order.order_id] = fetched
+                self._set_state(order.order_id, order.state)
+            self._orders[order.order_id] = order
+            return order
+
+    def get(self, order_id: str, fetch: Callable[[str], Order] = None, fields: Iterable[str] = ()) -> Optional[Order]:
+        """
+        Возвращает заказ. Если заказа нет или у него не заполнено одно из полей fields,
+        подробности запрашиваются через fetch (одновременные запросы одного заказа объединяются).
+
+        :param order_id: ID заказа
+        :param fetch: функция запроса заказа из API (например :meth:`Bot.get_order`)
+        :param fields: поля, которые должны быть заполнены
+
+        :return: Экземпляр Order или None, если заказа нет, а fetch не передан
+        """
+        order = self._lookup(order_id, fields)
+        if order is not None or fetch is None:
+            return order
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(order_id, Lock())
+        try:
+            with fetch_lock:
+                # Пока ждали, заказ мог загрузить другой поток
+                order = self._lookup(order_id, fields)
+                if order is None:
+                    order = self.put(fetch(order_id))
+                    with self._lock:
+                        self.fetches += 1
+        finally:
+            with self._lock:
+                self._fetch_locks.pop(order_id, None)
+        return order
+
+    def _lookup(self, order_id: str, fields: Iterable[str]) -> Optional[Order]:
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None or any(getattr(order, name, None) is None for name in fields):
+                return None
+            self.hits += 1
+            return order
+
+    def state(self, order_id: str) -> Optional[str]:
+        """
+        Последний известный статус заказа (в том числе заказа, подробности которого не запрашивались).
+        """
+        with self._lock:
+            return self._states.get(order_id)
+
+    def ids_by_state(self, state: str | int) -> Set[str]:
+        """
+        ID всех известных заказов в статусе.
+
+        :param state: статус (например ``"paid"`` или ``ORDER_STATES.PAID``)
+        """
+        with self._lock:
+            return set(self._by_state.get(_state_name(state), ()))
+
+    def by_state(self, state: str | int) -> List[Order]:
+        """
+        Заказы в статусе, подробности которых уже загружены.
+
+        :param state: статус (например ``"paid"`` или ``ORDER_STATES.PAID``)
+        """
+        with self._lock:
+            return [self._orders[i] for i in self._by_state.get(_state_name(state), ()) if i in self._orders]
+
+    def forget(self, order_id: str):
+        """
+        Удаляет заказ из хранилища.
+        """
+        with self._lock:
+            self._orders.pop(order_id, None)
+            self._last_history.pop(order_id, None)
+            state = self._states.pop(order_id, None)
+            if state is not None:
+                ids = self._by_state.get(state)
+                if ids is not None:
+                    ids.discard(order_id)
+                    if not ids:
+                        del self._by_state[state]
+
+    def __len__(self):
+        return len(self._states)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Метрики хранилища.
+        """
+        with self._lock:
+            return {
+                "orders": len(self._states),
+                "detailed": len(self._orders),
+                "fetches": self.fetches,
+                "hits": self.hits,
+                "applied": self.applied,
+            }
@@ -0,0 +1,193 @@
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+Page = TypeVar("Page")
+
+
+def _next_cursor(page: Any) -> Optional[str]:
+    return page.next_cursor
+
+
+def _last_page(page: Any) -> Optional[int]:
+    return page.last_page
+
+
+def iter_pages(fetch: Callable[[Optional[str]], Page], cursor: str = None,
+               next_cursor: Callable[[Page], Optional[str]] = _next_cursor,
+               last: Callable[[Page], bool] = None) -> Iterator[Page]:
+    """
+    Проходит страницы по курсору. Следующая страница запрашивается в фоновом потоке,
+    пока вызывающий код обрабатывает текущую.
+
+    :param fetch: функция запроса страницы по курсору (None - первая страница)
+    :param cursor: курсор первой страницы
+    :param next_cursor: функция, возвращающая курсор следующей страницы (None - страница последняя)
+    :param last: функция, возвращающая True, если следующие страницы не нужны (следующая страница не запрашивается)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PaygameAPI-pages")
+    try:
+        future = executor.submit(fetch, cursor)
+        while future is not None:
+            page = future.result()
+            cursor = next_cursor(page)
+            future = executor.submit(fetch, cursor) if cursor and not (last and last(page)) else None
+            yield page
+    finally:
+        # Генератор могли закрыть раньше: запрошенная заранее страница больше не нужна
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_pages(fetch: Callable[[Optional[str]], Awaitable[Page]], cursor: str = None,
+                      next_cursor: Callable[[Page], Optional[str]] = _next_cursor,
+                      last: Callable[[Page], bool] = None) -> AsyncIterator[Page]:
+    """
+    Асинхронный вариант :func:`iter_pages`: следующая страница запрашивается отдельной задачей.
+    """
+    import asyncio
+
+    task = asyncio.create_task(fetch(cursor))
+    try:
+        while task is not None:
+            page = await task
+            cursor = next_cursor(page)
+            task = asyncio.create_task(fetch(cursor)) if cursor and not (last and last(page)) else None
+            yield page
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
+
+
+def iter_numbered_pages(fetch: Callable[[int], Page], first: int = 1, concurrency: int = 4,
+                        last_page: Callable[[Page], Optional[int]] = _last_page) -> Iterator[Page]:
+    """
+    Проходит страницы с номерами. После первой страницы известен номер последней,
+    поэтому остальные запрашиваются параллельно (не больше concurrency одновременно)
+    и возвращаются по порядку номеров.
+
+    :param fetch: функция запроса страницы по номеру
+    :param first: номер первой страницы
+    :param concurrency: максимальное количество одновременных запросов
+    :param last_page: функция, возвращающая номер последней страницы
+    """
+    page = fetch(first)
+    last = last_page(page)
+    if not last or last <= first:
+        yield page
+        return
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="PaygameAPI-pages")
+    try:
+        numbers = iter(range(first + 1, last + 1))
+        window = deque(executor.submit(fetch, number) for number in islice(numbers, concurrency))
+        yield page
+        while window:
+            page = window.popleft().result()
+            number = next(numbers, None)
+            if number is not None:
+                window.append(executor.submit(fetch, number))
+            yield page
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_numbered_pages(fetch: Callable[[int], Awaitable[Page]], first: int = 1, concurrency: int = 4,
+                               last_page: Callable[[Page], Optional[int]] = _last_page) -> AsyncIterator[Page]:
+    """
+    Асинхронный вариант :func:`iter_numbered_pages`: страницы запрашиваются отдельными задачами.
+    """
+    page = await fetch(first)
+    last = last_page(page)
+    if not last or last <= first:
+        yield page
+        return
+    import asyncio
+
+    numbers = iter(range(first + 1, last + 1))
+    window = deque(asyncio.create_task(fetch(number)) for number in islice(numbers, concurrency))
+    try:
+        yield page
+        while window:
+            page = await window.popleft()
+            number = next(numbers, None)
+            if number is not None:
+                window.append(asyncio.create_task(fetch(number)))
+            yield page
+    finally:
+        for task in window:
+            task.cancel()
+
+
+class Watermark:
+    """
+    Граница инкрементальной синхронизации для списков, отсортированных от новых записей к старым:
+    момент времени или ID последней уже полученной записи. Записи начиная с границы не возвращаются.
+
+    :param since: datetime - пропустить записи, созданные не позже этого момента;
+        строка - ID записи, с которой начинаются уже полученные
+    :type since: :obj:`datetime` | :obj:`str`
+
+    :param date_field: поле записи с датой создания
+    :type date_field: :obj:`str`
+
+    :param id_field: поле записи с ID
+    :type id_field: :obj:`str`
+    """
+
+    def __init__(self, since: datetime | str, date_field: str = "created_date", id_field: str = "uuid_id"):
+        self.since = since
+        self.date_field = date_field
+        self.id_field = id_field
+
+    def reached(self, item: Any) -> bool:
+        since = self.since
+        if isinstance(since, datetime):
+            created = getattr(item, self.date_field)
+            if created is None:
+                return False
+            if created.tzinfo is not None and since.tzinfo is None:
+                since = since.astimezone()  # Наивное время считаем локальным
+            elif created.tzinfo is None and since.tzinfo is not None:
+                created = created.astimezone()
+            return created <= since
+        return getattr(item, self.id_field) == since
+
+    def page_reached(self, page: Any) -> bool:
+        return any(self.reached(item) for item in page.results)
+
+
+def iter_items(pages: Iterator[Page], stop: Callable[[Any], bool] = None, reverse: bool = False) -> Iterator[Any]:
+    """
+    Записи со страниц по порядку, до первой записи, для которой stop вернет True (например :meth:`Watermark.reached`).
+
+    :param pages: страницы
+    :param stop: условие остановки (запись, на которой оно выполнилось, не возвращается)
+    :param reverse: возвращать записи каждой страницы в обратном порядке
+    """
+    try:
+        for page in pages:
+            for item in reversed(page.results) if reverse else page.results:
+                if stop is not None and stop(item):
+                    return
+                yield item
+    finally:
+        pages.close()
+
+
+async def aiter_items(pages: AsyncIterator[Page], stop: Callable[[Any], bool] = None,
+                      reverse: bool = False) -> AsyncIterator[Any]:
+    """
+    Асинхронный вариант :func:`iter_items`.
+    """
+    try:
+        async for page in pages:
+            for item in reversed(page.results) if reverse else page.results:
+                if stop is not None and stop(item):
+                    return
+                yield item
+    finally:
+        await pages.aclose()
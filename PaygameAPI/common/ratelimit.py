@@ -0,0 +1,188 @@
+import time
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+
+def endpoint_group(url: str) -> str:
+    """
+    Определяет группу эндпоинтов по ссылке: первый сегмент пути после префикса API.
+    Например, ``https://api.paygame.ru/api/v1/messager/1/add/`` -> ``messager``.
+
+    :param url: ссылка на метод API
+    :return: название группы
+    """
+    path = urlparse(url).path
+    for prefix in ("/api/v1/", "/api/"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+            break
+    return path.strip("/").split("/", 1)[0] or "default"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает заголовок Retry-After (секунды или HTTP-дата).
+
+    :param value: значение заголовка
+    :return: сколько секунд нужно подождать или None
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    import email.utils
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0)
+
+
+class TokenBucket:
+    """
+    Ведро токенов с адаптивной скоростью пополнения (AIMD).
+    Успешные запросы понемногу увеличивают скорость до max_rate, ответ 429 уменьшает ее вдвое.
+
+    :param rate: Начальная скорость (запросов в секунду)
+    :type rate: :obj:`float`
+
+    :param burst: Емкость ведра (сколько запросов можно выполнить подряд без ожидания)
+    :type burst: :obj:`int`
+
+    :param max_rate: Максимальная скорость
+    :type max_rate: :obj:`float`
+
+    :param min_rate: Минимальная скорость
+    :type min_rate: :obj:`float`
+
+    :param increase: Прирост скорости после каждого успешного запроса
+    :type increase: :obj:`float`
+    """
+
+    def __init__(self, rate: float, burst: int, max_rate: float = None, min_rate: float = None,
+                 increase: float = 0.1):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate or rate / 16
+        self.increase = increase
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _fill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Забирает токен и возвращает, сколько секунд нужно подождать перед запросом.
+        """
+        now = time.monotonic()
+        self._fill(now)
+        self.tokens -= 1
+        wait = max(self.blocked_until - now, 0)
+        if self.tokens < 0:
+            wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+    def penalize(self, retry_after: float = None):
+        """
+        Замедляет ведро после ответа 429.
+
+        :param retry_after: сколько секунд сервер просит подождать
+        """
+        now = time.monotonic()
+        self._fill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+        self.blocked_until = max(self.blocked_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+
+    def reward(self):
+        """
+        Ускоряет ведро после успешного запроса.
+        """
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов с отдельным ведром токенов на каждую группу эндпоинтов.
+    Потокобезопасен, один экземпляр можно использовать из всех потоков бота.
+
+    :param rate: Начальная скорость для группы (запросов в секунду)
+    :type rate: :obj:`float`
+
+    :param burst: Сколько запросов группы можно выполнить подряд без ожидания
+    :type burst: :obj:`int`
+
+    :param max_rate: Максимальная скорость, до которой разгоняется группа
+    :type max_rate: :obj:`float`
+
+    :param groups: Настройки отдельных групп: ``{"messager": (rate, burst)}``
+    :type groups: :obj:`Dict[str, Tuple[float, int]]`
+    """
+
+    def __init__(self, rate: float = 5, burst: int = 10, max_rate: float = 20,
+                 groups: Dict[str, Tuple[float, int]] = None):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate
+        self.groups = groups or {}
+
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.throttled = 0  # Количество полученных ответов 429
+        self.waited = 0.0  # Суммарное время ожидания в секундах
+
+        self._lock = Lock()
+
+    def _bucket(self, group: str) -> TokenBucket:
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            rate, burst = self.groups.get(group, (self.rate, self.burst))
+            bucket = self.buckets[group] = TokenBucket(rate, burst, max(rate, self.max_rate))
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        """
+        Резервирует запрос к url и возвращает, сколько секунд нужно подождать перед ним.
+        Не блокирует, поэтому подходит и для asyncio.
+
+        :param url: ссылка на метод API
+        """
+        with self._lock:
+            wait = self._bucket(endpoint_group(url)).reserve()
+            self.waited += wait
+        return wait
+
+    def acquire(self, url: str):
+        """
+        Ждет, пока запрос к url можно будет выполнить.
+
+        :param url: ссылка на метод API
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    def update(self, url: str, status_code: int, retry_after: str = None):
+        """
+        Подстраивает скорость группы по ответу сервера.
+
+        :param url: ссылка на метод API
+        :param status_code: статус-код ответа
+        :param retry_after: значение заголовка Retry-After
+        """
+        with self._lock:
+            bucket = self._bucket(endpoint_group(url))
+            if status_code == 429:
+                self.throttled += 1
+                bucket.penalize(parse_retry_after(retry_after))
+            elif status_code < 400:
+                bucket.reward()
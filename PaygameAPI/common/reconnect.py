@@ -0,0 +1,92 @@
+import random
+from typing import Any, Dict, List, Optional
+
+
+class Backoff:
+    """
+    Экспоненциальная задержка между переподключениями со случайным разбросом (full jitter).
+
+    :param initial: Задержка перед первой попыткой в секундах
+    :type initial: :obj:`float`
+
+    :param maximum: Максимальная задержка в секундах
+    :type maximum: :obj:`float`
+
+    :param factor: Во сколько раз растет задержка после каждой неудачной попытки
+    :type factor: :obj:`float`
+
+    :param jitter: Доля задержки, которая выбирается случайно (0 - без разброса, 1 - от 0 до полной задержки)
+    :type jitter: :obj:`float`
+    """
+
+    def __init__(self, initial: float = 1, maximum: float = 60, factor: float = 2, jitter: float = 0.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next(self) -> float:
+        """
+        Возвращает задержку перед следующей попыткой и увеличивает счетчик попыток.
+        """
+        delay = min(self.maximum, self.initial * self.factor ** self.attempts)
+        self.attempts += 1
+        return delay * (1 - self.jitter * random.random())
+
+    def reset(self):
+        """
+        Сбрасывает счетчик после успешного подключения.
+        """
+        self.attempts = 0
+
+
+class Recovery:
+    """
+    Состояние восстановления подписки Centrifugo: приватный канал, эпоха и смещение последней полученной публикации.
+    При переподключении сервер досылает публикации, пропущенные после этого смещения.
+    """
+
+    def __init__(self, channel: str = None, epoch: str = None, offset: int = 0):
+        self.channel = channel
+        self.epoch = epoch
+        self.offset = offset
+
+    def connect_params(self, token: str) -> Dict[str, Any]:
+        """
+        Параметры команды подключения. Если канал уже известен - с запросом восстановления пропущенных публикаций.
+
+        :param token: токен подключения
+        """
+        params: Dict[str, Any] = {"token": token}
+        if self.channel and self.epoch:
+            params["subs"] = {self.channel: {"recover": True, "epoch": self.epoch, "offset": self.offset}}
+        return params
+
+    def on_connect(self, result: Dict[str, Any], channel: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Обновляет состояние по ответу на подключение.
+
+        :param result: поле result ответа сервера
+        :param channel: приватный канал из ответа
+
+        :return: восстановленные публикации в формате обычных сообщений вебсокета
+        """
+        sub = (result.get("subs") or {}).get(channel) or {}
+        if channel != self.channel or sub.get("epoch") != self.epoch:
+            # Новый канал или сервер сменил эпоху - восстанавливать нечего
+            self.channel = channel
+            self.epoch = sub.get("epoch")
+            self.offset = sub.get("offset", 0)
+            return []
+        self.offset = max(self.offset, sub.get("offset", 0))
+        return [{"result": {"channel": channel, "data": pub}} for pub in sub.get("publications") or []]
+
+    def update(self, offset: Optional[int]):
+        """
+        Запоминает смещение полученной публикации.
+
+        :param offset: смещение публикации (см. :attr:`decoder.Frame.offset`)
+        """
+        if offset:
+            self.offset = max(self.offset, offset)
@@ -0,0 +1,128 @@
+import json
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from .journal import read_journal
+
+# Методы Bot, выполняющие запросы к API. При прогоне записанных событий они подменяются заглушками
+API_METHODS = (
+    "get_user", "get_me", "online_users", "create_offer", "read_notifications", "get_order", "send_message",
+    "reply_to_review", "upload_image", "chat_messages", "get_chat_history", "get_chats", "read_messages",
+    "get_latest_notifications", "get_notifications", "get_reviews", "change_settings", "order_in_work",
+    "order_refund", "cancel_order",
+)
+# Методы, проходящие страницы API: заглушки возвращают пустой результат, а не None
+EMPTY_RESULTS = {
+    "iter_chat_messages": lambda: iter(()),
+    "iter_notifications": lambda: iter(()),
+    "iter_reviews": lambda: iter(()),
+    "get_all_reviews": list,
+}
+
+
+class HandlerStats:
+    """
+    Статистика обработчика за прогон.
+    """
+    __slots__ = ("calls", "fired", "errors", "total_time", "max_time")
+
+    def __init__(self):
+        self.calls = 0  # Событий, переданных обработчику (для сообщений - подобранных по тексту индексом)
+        self.fired = 0  # Событий, прошедших фильтры
+        self.errors = 0  # Исключений в обработчике
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def add(self, elapsed: float, fired: bool, error: bool = False):
+        self.calls += 1
+        self.fired += fired
+        self.errors += error
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+
+class ReplayReport:
+    """
+    Результат прогона записанных событий через обработчики (см. :meth:`Bot.replay`).
+    """
+
+    def __init__(self):
+        self.frames = 0  # Прочитано сообщений вебсокета
+        self.events = 0  # Событий, переданных обработчикам
+        self.elapsed = 0.0  # Время прогона в секундах
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.api_calls: Dict[str, int] = {}  # Вызовы методов API (заглушек)
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def fired(self) -> List[str]:
+        """
+        Обработчики, сработавшие хотя бы раз.
+        """
+        return [name for name, stats in self.handlers.items() if stats.fired]
+
+    def handler(self, name: str) -> HandlerStats:
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        return stats
+
+    def __str__(self):
+        lines = [f"Сообщений: {self.frames}, событий: {self.events}, {self.elapsed:.3f} с "
+                 f"({self.events_per_second:.0f} событий/с)"]
+        for name, stats in self.handlers.items():
+            lines.append(f"  {name}: сработал {stats.fired}/{stats.calls}, ошибок {stats.errors}, "
+                         f"среднее {stats.mean_time * 1e6:.1f} мкс, максимум {stats.max_time * 1e6:.1f} мкс")
+        if self.api_calls:
+            lines.append("  Вызовы API: " + ", ".join(f"{k}={v}" for k, v in self.api_calls.items()))
+        return "\n".join(lines)
+
+
+def read_frames(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Читает записанные сообщения вебсокета: из журнала событий (директория)
+    или из файла, в котором каждая строка - сообщение в формате JSON.
+
+    :param path: путь к журналу или файлу
+    """
+    if os.path.isdir(path):
+        yield from read_journal(path)
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+@contextmanager
+def stubbed_api(bot, report: ReplayReport):
+    """
+    Подменяет методы API бота заглушками, которые только считают вызовы и возвращают None
+    (методы из EMPTY_RESULTS - пустой результат).
+
+    Заглушки устанавливаются на сам экземпляр (обработчики обычно обращаются к боту через глобальную
+    переменную), поэтому бот не должен одновременно обрабатывать события вебсокета.
+    """
+    def stub(name, result=lambda: None):
+        def method(*args, **kwargs):
+            report.api_calls[name] = report.api_calls.get(name, 0) + 1
+            return result()
+        return method
+
+    stubs = {name: stub(name) for name in API_METHODS}
+    stubs.update((name, stub(name, result)) for name, result in EMPTY_RESULTS.items())
+    for name, method in stubs.items():
+        setattr(bot, name, method)
+    try:
+        yield
+    finally:
+        for name in stubs:
+            bot.__dict__.pop(name, None)
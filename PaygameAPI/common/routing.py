@@ -0,0 +1,121 @@
+from collections import deque
+from typing import Any, Dict, Hashable, List, Set
+
+
+class Automaton:
+    """
+    Автомат Ахо-Корасик: поиск всех шаблонов в тексте за один проход.
+    Время поиска зависит от длины текста и количества совпадений, но не от количества шаблонов.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Hashable]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, value: Hashable):
+        """
+        Добавляет шаблон.
+
+        :param pattern: шаблон
+        :param value: значение, возвращаемое при совпадении шаблона
+        """
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(value)
+        self._built = False
+
+    def build(self):
+        """
+        Строит переходы по ошибке. Вызывается автоматически при первом поиске после добавления шаблонов.
+        """
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                # Шаблоны, оканчивающиеся в суффиксе, совпадают вместе с текущим
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def find(self, text: str) -> Set[Hashable]:
+        """
+        Возвращает значения всех шаблонов, входящих в текст.
+        """
+        if not self._built:
+            self.build()
+        found: Set[Hashable] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class MessageRouter:
+    """
+    Индекс обработчиков сообщений. Фильтры ``text`` собираются в словарь, фильтры ``text_contains`` -
+    в автомат Ахо-Корасик, поэтому подбор обработчиков не зависит от их количества.
+
+    Обработчики возвращаются в порядке регистрации, как при последовательной проверке.
+    """
+
+    def __init__(self, handlers: List[Any] = None):
+        self.rebuild(handlers or [])
+
+    def rebuild(self, handlers: List[Any]):
+        """
+        Пересобирает индекс.
+
+        :param handlers: обработчики (объекты с атрибутами ``text`` и ``text_contains``)
+        """
+        exact: Dict[str, List[int]] = {}
+        automaton = Automaton()
+        unfiltered: List[int] = []
+        for i, handler in enumerate(handlers):
+            if handler.text is not None:
+                # Для обработчика с обоими фильтрами вхождение проверяется только после точного совпадения
+                exact.setdefault(handler.text, []).append(i)
+            elif handler.text_contains is not None:
+                automaton.add(handler.text_contains, i)
+            else:
+                unfiltered.append(i)
+        automaton.build()
+
+        # Индекс заменяется одним присваиванием, чтобы регистрация не мешала обработке событий в других потоках
+        self._index = (list(handlers), exact, automaton, unfiltered)
+
+    def match(self, text: str) -> List[Any]:
+        """
+        Возвращает обработчики, текстовые фильтры которых подходят к сообщению.
+
+        :param text: текст сообщения
+        """
+        handlers, exact, automaton, unfiltered = self._index
+        text = (text or "").lower()
+        indexes = set(unfiltered)
+        indexes.update(automaton.find(text))
+        for i in exact.get(text, ()):
+            contains = handlers[i].text_contains
+            if contains is None or contains in text:
+                indexes.add(i)
+        return [handlers[i] for i in sorted(indexes)]
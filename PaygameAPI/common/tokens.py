@@ -0,0 +1,268 @@
+import base64
+import json
+import logging
+import time
+from threading import Lock, Timer
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+
+logger = logging.getLogger("PaygameAPI")
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """
+    Достает время истечения (поле exp) из JWT токена без проверки подписи.
+
+    :param token: access токен
+    :return: unix-время истечения токена или None, если токен не является JWT
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+    except (IndexError, ValueError, AttributeError):
+        return None
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+class TokenManager:
+    """
+    Хранит access токен, следит за сроком его действия и обновляет его заранее.
+
+    Одновременные запросы на обновление схлопываются в один (single-flight): пока один поток обновляет токен,
+    остальные ждут и получают уже обновленный токен.
+
+    :param refresh_token: RefreshToken от PayGame
+    :type refresh_token: :obj:`str`
+
+    :param refresh_margin: За сколько секунд до истечения обновлять токен
+    :type refresh_margin: :obj:`float`
+
+    :param default_ttl: Время жизни токена, если его не удалось прочитать из самого токена
+    :type default_ttl: :obj:`float`
+
+    :param background: Обновлять токен в фоне до истечения срока действия?
+    :type background: :obj:`bool`
+
+    :param request_kwargs: Дополнительные аргументы запроса обновления токена (см. :func:`apihelper._make_request`)
+    :type request_kwargs: :obj:`Dict[str, Any]`
+    """
+
+    def __init__(self, refresh_token: str, refresh_margin: float = 60, default_ttl: float = 300,
+                 background: bool = True, request_kwargs: Dict[str, Any] = None):
+        self.refresh_token = refresh_token
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.background = background
+        self.request_kwargs = request_kwargs or {}
+
+        self.access_token: str | None = None
+        self.expires_at: float = 0
+        self.refreshes = 0  # Количество выполненных обновлений токена
+
+        self._lock = Lock()
+        self._timer: Timer | None = None
+
+    @property
+    def expired(self) -> bool:
+        """
+        True, если токена нет или он истекает в пределах refresh_margin.
+        """
+        return not self.access_token or time.time() >= self.expires_at - self.refresh_margin
+
+    def get(self) -> str:
+        """
+        Возвращает действующий access токен, при необходимости обновляя его.
+        """
+        token = self.access_token
+        if token and time.time() < self.expires_at - self.refresh_margin:
+            return token
+        return self._refresh(token)
+
+    def refresh(self) -> str:
+        """
+        Принудительно обновляет токен.
+        """
+        return self._refresh(self.access_token)
+
+    def invalidate(self, token: str) -> str:
+        """
+        Сообщает, что токен был отклонен сервером. Если его еще никто не обновил - обновляет.
+
+        :param token: отклоненный access токен
+        :return: новый access токен
+        """
+        return self._refresh(token)
+
+    def set(self, access_token: str, expires_at: float = None):
+        """
+        Устанавливает уже полученный access токен (например, восстановленный с диска).
+
+        :param access_token: access токен
+        :param expires_at: unix-время истечения токена
+        """
+        with self._lock:
+            self._set(access_token, expires_at)
+        self._schedule()
+
+    def close(self):
+        """
+        Останавливает фоновое обновление токена.
+        """
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _refresh(self, stale: str | None) -> str:
+        from .apihelper import _refresh_token
+
+        with self._lock:
+            # Пока ждали блокировку, токен мог обновить другой поток
+            if self.access_token != stale and not self.expired:
+                return self.access_token
+            self._set(_refresh_token(self.refresh_token, **self.request_kwargs))
+            self.refreshes += 1
+            token = self.access_token
+        self._schedule()
+        return token
+
+    def _set(self, access_token: str, expires_at: float = None):
+        self.access_token = access_token
+        self.expires_at = expires_at or token_expiry(access_token) or time.time() + self.default_ttl
+
+    def _schedule(self):
+        if not self.background:
+            return
+        self.close()
+        delay = max(self.expires_at - self.refresh_margin - time.time(), 1)
+        self._timer = Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh(self.access_token)
+        except Exception as e:
+            # Следующий вызов get() попробует обновить токен еще раз
+            logger.warning(f"Не удалось обновить токен в фоне: {e}")
+
+
+class AsyncTokenManager:
+    """
+    Асинхронный аналог :class:`TokenManager` для :class:`AsyncBot`.
+    Одновременные корутины, которым нужен новый токен, дожидаются одного общего обновления.
+
+    :param refresh_token: RefreshToken от PayGame
+    :type refresh_token: :obj:`str`
+
+    :param refresh_margin: За сколько секунд до истечения обновлять токен
+    :type refresh_margin: :obj:`float`
+
+    :param default_ttl: Время жизни токена, если его не удалось прочитать из самого токена
+    :type default_ttl: :obj:`float`
+
+    :param background: Обновлять токен в фоне до истечения срока действия?
+    :type background: :obj:`bool`
+
+    :param request_kwargs: Дополнительные аргументы запроса обновления токена (см. :func:`asyncio_helper._make_request`)
+    :type request_kwargs: :obj:`Dict[str, Any]`
+    """
+
+    def __init__(self, refresh_token: str, refresh_margin: float = 60, default_ttl: float = 300,
+                 background: bool = True, request_kwargs: Dict[str, Any] = None):
+        self.refresh_token = refresh_token
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.background = background
+        self.request_kwargs = request_kwargs or {}
+
+        self.access_token: str | None = None
+        self.expires_at: float = 0
+        self.refreshes = 0
+
+        self._lock: Optional["asyncio.Lock"] = None  # Создается внутри работающего цикла событий
+        self._handle: Optional["asyncio.TimerHandle"] = None
+        self._task: Optional["asyncio.Task"] = None  # Фоновое обновление (ссылка не дает циклу удалить задачу)
+
+    @property
+    def expired(self) -> bool:
+        """
+        True, если токена нет или он истекает в пределах refresh_margin.
+        """
+        return not self.access_token or time.time() >= self.expires_at - self.refresh_margin
+
+    async def get(self) -> str:
+        """
+        Возвращает действующий access токен, при необходимости обновляя его.
+        """
+        token = self.access_token
+        if token and time.time() < self.expires_at - self.refresh_margin:
+            return token
+        return await self._refresh(token)
+
+    async def refresh(self) -> str:
+        """
+        Принудительно обновляет токен.
+        """
+        return await self._refresh(self.access_token)
+
+    async def invalidate(self, token: str) -> str:
+        """
+        Сообщает, что токен был отклонен сервером. Если его еще никто не обновил - обновляет.
+
+        :param token: отклоненный access токен
+        :return: новый access токен
+        """
+        return await self._refresh(token)
+
+    def close(self):
+        """
+        Останавливает фоновое обновление токена.
+        """
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh(self, stale: str | None) -> str:
+        import asyncio
+        from .asyncio_helper import _refresh_token
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.access_token != stale and not self.expired:
+                return self.access_token
+            self.access_token = await _refresh_token(self.refresh_token, **self.request_kwargs)
+            self.expires_at = token_expiry(self.access_token) or time.time() + self.default_ttl
+            self.refreshes += 1
+        self._schedule()
+        return self.access_token
+
+    def _schedule(self):
+        if not self.background:
+            return
+        if self._handle:
+            self._handle.cancel()
+        import asyncio
+
+        delay = max(self.expires_at - self.refresh_margin - time.time(), 1)
+        self._handle = asyncio.get_running_loop().call_later(delay, self._start_background_refresh)
+
+    def _start_background_refresh(self):
+        import asyncio
+
+        self._handle = None
+        self._task = asyncio.ensure_future(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self._refresh(self.access_token)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить токен в фоне: {e}")
+        finally:
+            self._task = None
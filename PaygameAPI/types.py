@@ -123,6 +123,30 @@ class Params:
         }
 
 
+class _LazyDatetime:
+    """
+    Поле с датой. Хранит исходную строку ISO 8601 (в слоте с префиксом ``_``) и преобразует ее в datetime
+    при первом обращении. Результат сохраняется, поэтому строка разбирается не больше одного раза.
+    Можно присвоить как строку, так и datetime / None.
+    """
+    __slots__ = ("slot",)
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value) if value else None
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
 class BasePages:
     """
     Базовый класс для объектов со страницами (Черный список, отзывы и т. д.)
@@ -163,6 +187,10 @@ class BasePages:
     :param results: Результаты текущей страницы
     :type results: :obj:`list`
     """
+    __slots__ = (
+        "current_page", "next", "last_page", "previous", "current_page_url", "next_url", "last_page_url",
+        "previous_url", "total", "start_index", "end_index", "results",
+    )
     def __init__(self, current_page: int = None, next: int = None, last_page: int = None, previous: int = None,
                  current_page_url: str = None, next_url: str = None,
                  last_page_url: str = None, previous_url: str = None, total: int = None, start_index: int = None,
@@ -192,6 +220,7 @@ class ImageMeta:
     :param height: Высота изображения
     :type height: :obj:`int`
     """
+    __slots__ = ("width", "height")
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
@@ -206,6 +235,7 @@ class BannedStatus:
     :param freeze: Статус и причина заморозки
     :type freeze: :obj:`dict`
     """
+    __slots__ = ("ban_status", "ban_reason", "freeze_status", "freeze_reason")
     def __init__(self, freeze: dict, ban: dict):
         self.ban_status = ban.get("status")
         self.ban_reason = ban.get("reason")
@@ -229,6 +259,7 @@ class Image:
     :param completed: Завершено ли изображение
     :type completed: :obj:`bool`
     """
+    __slots__ = ("id", "type", "file", "image", "meta", "url_small", "url_thumbnail", "url_orig_size", "completed")
     def __init__(self, id: str, type: str, image: str, meta: ImageMeta, preview: dict, completed: bool, file: str = None):
         self.id = id
         self.type = type
@@ -250,6 +281,7 @@ class UserNotifications:
     :param telegram: Уведомления Telegram
     :type telegram: :obj:`bool`
     """
+    __slots__ = ("browser", "telegram")
     def __init__(self, browser: bool, telegram: bool):
         self.browser = browser
         self.telegram = telegram
@@ -270,6 +302,7 @@ class UserPlan:
     :param image: Изображение плана
     :type image: :obj:`Optional[str]`
     """
+    __slots__ = ("id", "title", "slug", "image")
     def __init__(self, id: int, title: str, slug: str, image: Optional[str]):
         self.id = id
         self.title = title
@@ -346,6 +379,13 @@ class UserProfile:
     :param trusted: Доверенный пользователь
     :type trusted: :obj:`Optional[bool]`
     """
+    __slots__ = (
+        "username", "avatar", "id", "is_online", "is_active", "_last_active", "is_support", "banned", "notifications",
+        "plan", "about", "_date_joined", "rating", "extra", "is_verified", "purchases", "sales", "review_count",
+        "blocked_from_me", "blocked_remote", "lots", "trusted",
+    )
+    last_active = _LazyDatetime()
+    date_joined = _LazyDatetime()
     def __init__(self, username: str, avatar: Optional[str], id: int, is_online: bool = None, is_active: bool = None,
                  last_active: datetime = None, is_support: bool = None, banned: BannedStatus = None,
                  notifications: UserNotifications = None, plan: UserPlan = None, about: str = None, date_joined: datetime = None,
@@ -421,6 +461,10 @@ class SelfUserProfile(UserProfile):
     :param laws: Юридическая информация
     :type laws: :obj:`Dict`
     """
+    __slots__ = (
+        "email", "phone", "balance", "last_read", "config", "referral_code", "referral_percent", "email_confirmed",
+        "notices", "orders", "raise_limits", "access_ideas", "cc_percent", "laws",
+    )
     def __init__(self, email: str, phone: Optional[str], balance: float, last_read: int, config: Dict, referral_code: str, referral_percent: str,
                  email_confirmed: bool, notices: int, orders: Dict, raise_limits: Dict, access_ideas: bool, cc_percent: Optional[str], laws: Dict, **kwargs):
         super().__init__(**kwargs)
@@ -476,6 +520,10 @@ class Message:
     :param distrust: Недоверие к сообщению
     :type distrust: :obj:`Optional[Dict]`
     """
+    __slots__ = (
+        "id", "sender", "created_date", "text", "chat_id", "extra", "media", "type", "service_type", "removed",
+        "distrust",
+    )
     def __init__(self, id: int, sender: UserProfile, created_date: str, text: str, chat_id: int,
                  extra: Optional[Dict], media: List[Image], type: str, service_type: str,
                  removed: bool, distrust: Optional[Dict]):
@@ -504,6 +552,7 @@ class Draft:
     :param has_media: Наличие медиа
     :type has_media: :obj:`int`
     """
+    __slots__ = ("text", "has_media")
     def __init__(self, text: str, has_media: int):
         self.text = text
         self.has_media = has_media
@@ -541,6 +590,7 @@ class Chat:
 
 
     """
+    __slots__ = ("id", "uid", "count", "users", "last_message", "draft", "last_read", "date_pin", "pins")
     def __init__(self, id: int, count: int, users: List[UserProfile], uid: str = None, last_message: Message = None,
                  draft: Optional[Draft] = None, last_read: int = None, date_pin: str = None, pins: list = None):
         self.id = id
@@ -569,6 +619,7 @@ class ChatList:
     :param results: Список чатов
     :type results: :obj:`List[Chat]`
     """
+    __slots__ = ("count", "next", "previous", "results")
     def __init__(self, count: int, next: Optional[str], previous: Optional[str], results: List[Chat]):
         self.count = count
         self.next = next
@@ -582,6 +633,7 @@ class Blacklist(BasePages):
     :param results: Список черных пользователей
     :type results: :obj:`List[Blacklist]`
     """
+    __slots__ = ()
     def __init__(self, results: List[UserProfile], **kwargs):
         super().__init__(results=results, **kwargs)
 
@@ -599,6 +651,8 @@ class UserBlacklist:
     :param created_date: Дата создания записи
     :type created_date: :obj:`datetime`
     """
+    __slots__ = ("id", "user", "_created_date")
+    created_date = _LazyDatetime()
     def __init__(self, id: int, user: UserProfile, created_date: datetime):
         self.id = id
         self.user = user
@@ -623,6 +677,7 @@ class GameServer:
     :param has_servers: Имеет ли серверы
     :type has_servers: :obj:`bool`
     """
+    __slots__ = ("id", "icon", "slug", "title", "has_servers")
     def __init__(self, id: int, icon: Optional[str], slug: str, title: str, has_servers: bool):
         self.id = id
         self.icon = icon
@@ -652,6 +707,7 @@ class OfferType:
     :param variant: Вариант предложения. Опционально
     :type variant: :obj:`str`
     """
+    __slots__ = ("id", "slug", "name", "position", "variant")
     def __init__(self, id: int, slug: str, name: str, position: str, variant: str = "default"):
         self.id = id
         self.slug = slug
@@ -735,6 +791,13 @@ class OfferData:
     :param minimal_quantity: Минимальное количество
     :type minimal_quantity: :obj:`str`
     """
+    __slots__ = (
+        "id", "game", "item", "pack", "price", "risks", "title", "views", "images", "seller", "category", "quantity",
+        "is_active", "is_frozen", "unlimited", "offer_data", "offer_type", "video_link", "description", "game_server",
+        "_last_raised", "_created_date", "auto_delivery", "minimal_quantity",
+    )
+    last_raised = _LazyDatetime()
+    created_date = _LazyDatetime()
     def __init__(self, id: int, game: GameServer, item: Optional[Dict], pack: int, price: str, risks: List,
                  title: str, views: Dict[str, int], images: List[Image], seller: UserProfile, category: Optional[Dict],
                  quantity: str, is_active: bool, is_frozen: bool, unlimited: bool, offer_data: List[Dict],
@@ -778,6 +841,8 @@ class OrderHistory:
     :param created_date: Дата создания истории
     :type created_date: :obj:`datetime`
     """
+    __slots__ = ("id", "state", "_created_date")
+    created_date = _LazyDatetime()
     def __init__(self, id: int, state: str, created_date: datetime):
         self.id = id
         self.state = state
@@ -841,6 +906,12 @@ class Order:
     :param options: Опции заказа
     :type options: :obj:`List`
     """
+    __slots__ = (
+        "order_id", "customer", "quantity", "amount", "seller", "nickname", "state", "_created_date", "offer_data",
+        "reviewed", "offer", "order_history", "transaction", "funds_requested", "_deadline", "auto_delivery", "options",
+    )
+    created_date = _LazyDatetime()
+    deadline = _LazyDatetime()
     def __init__(self, order_id: str, customer: UserProfile, quantity: str, amount: str, seller: UserProfile,
                  nickname: str, state: str, created_date: datetime, offer_data: OfferData, reviewed: bool,
                  offer: OfferData, order_history: List[OrderHistory], transaction: Optional[Dict], funds_requested: bool,
@@ -895,6 +966,9 @@ class Notification:
     :param meta: Мета информация уведомления
     :type meta: :obj:`str`
     """
+    __slots__ = ("is_read", "_created_date", "uuid_id", "verb", "content_id", "title", "_date_of_reading", "meta")
+    created_date = _LazyDatetime()
+    date_of_reading = _LazyDatetime()
     def __init__(self, is_read: bool, created_date: datetime, uuid_id: str, verb: str, content_id: str,
                  title: Optional[str], date_of_reading: Optional[datetime], meta: str):
         self.is_read = is_read
@@ -925,6 +999,7 @@ class NotificationList:
     :param results: Список уведомлений.
     :type results: :obj: `List[Notification]`
     """
+    __slots__ = ("next", "previous", "next_cursor", "previous_cursor", "results")
     def __init__(self, next: Optional[str], previous: Optional[str], next_cursor: Optional[str], previous_cursor: Optional[str],
                  results: List[Notification]):
         self.next = next
@@ -933,6 +1008,34 @@ class NotificationList:
         self.previous_cursor = previous_cursor
         self.results = results
 
+class MessageList:
+    """
+    Класс для представления страницы сообщений чата.
+
+    :param next: Следующая (более старая) страница в виде ссылки.
+    :type next: :obj:`str`
+
+    :param previous: Предыдущая (более новая) страница в виде ссылки.
+    :type previous: :obj:`str`
+
+    :param next_cursor: Курсор для перехода на след. страницу - (передавать в параметрах запроса ?cursor=)
+    :type next_cursor: :obj:`str`
+
+    :param previous_cursor: Курсор для перехода на пред. страницу - (передавать в параметрах запроса ?cursor=)
+    :type previous_cursor: :obj:`str`
+
+    :param results: Список сообщений (от старых к новым).
+    :type results: :obj: `List[Message]`
+    """
+    __slots__ = ("next", "previous", "next_cursor", "previous_cursor", "results")
+    def __init__(self, next: Optional[str], previous: Optional[str], next_cursor: Optional[str], previous_cursor: Optional[str],
+                 results: List[Message]):
+        self.next = next
+        self.previous = previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.results = results
+
 class NotificationWidget:
     """
     Класс для представления виджета меню последних уведомлений.
@@ -952,6 +1055,7 @@ class NotificationWidget:
     :param results: Список уведомлений
     :type results: :obj:`List[Notification]`
     """
+    __slots__ = ("next", "previous", "next_cursor", "previous_cursor", "results")
     def __init__(self, next: Optional[str], previous: Optional[str], next_cursor: Optional[str],
                  previous_cursor: Optional[str], results: List[Notification]):
         self.next = next
@@ -970,6 +1074,8 @@ class ReviewReply:
     :param date: Дата ответа
     :type date: :obj:`datetime`
     """
+    __slots__ = ("text", "_date")
+    date = _LazyDatetime()
     def __init__(self, text: str, date: datetime):
         self.text = text
         self.date = date
@@ -990,6 +1096,7 @@ class ReviewOffer:
     :param offer_type: Тип предложения
     :type offer_type: :obj:`OfferType`
     """
+    __slots__ = ("id", "game_id", "game_title", "offer_type")
     def __init__(self, id: int, game_id: int, game_title: str, offer_type: OfferType):
         self.id = id
         self.game_id = game_id
@@ -1013,6 +1120,7 @@ class ReviewOrder:
     :param offer: Информация о предложении
     :type offer: :obj:`Dict`
     """
+    __slots__ = ("id", "state", "amount", "offer")
     def __init__(self, id: int, state: str, amount: str, offer: Dict):
         self.id = id
         self.state = state
@@ -1053,6 +1161,11 @@ class Review:
     :param is_included_in_rating: Включен ли отзыв в рейтинг
     :type is_included_in_rating: :obj:`bool`
     """
+    __slots__ = (
+        "id", "seller", "author", "rating", "text", "reply", "order", "_created_date", "is_anonymous",
+        "is_included_in_rating",
+    )
+    created_date = _LazyDatetime()
     def __init__(self, id: int, seller: UserProfile, author: UserProfile, rating: int, text: str,
                  reply: Optional[ReviewReply], order: ReviewOrder, created_date: datetime,
                  is_anonymous: bool, is_included_in_rating: bool):
@@ -1075,6 +1188,7 @@ class UserReviews(BasePages):
     :param results: Список отзывов
     :type results: :obj:`List[Review]`
     """
+    __slots__ = ()
     def __init__(self, results: List[Review], **kwargs):
         super().__init__(results=results, **kwargs)
 
@@ -1,18 +1,21 @@
 import json
 import logging
-import time
+from threading import Event
 from .common import events, enums
+from .common.decoder import Frame, decode
+from .common.dedup import EventDeduplicator
+from .common.dispatcher import Dispatcher
+from .common.reconnect import Backoff, Recovery
 from .common.enums import EventTypes
-import websocket
 from typing import List, Callable, Dict, Any
-from threading import Thread
 
 logger = logging.getLogger("websocket")
 
 
 class Socket:
     def __init__(self, token: str, NEW_EVENT_HANDLERS: List = None, OPEN_HANDLERS: list = None,
-                 CLOSE_HANDLERS: list = None, ERROR_HANDLERS: list = None, reconnect_socket: bool = True, **kwargs):
+                 CLOSE_HANDLERS: list = None, ERROR_HANDLERS: list = None, reconnect_socket: bool = True,
+                 dispatcher: Dispatcher = None, deduplicator: EventDeduplicator = None, **kwargs):
         """
         Инициализация WebSocket клиента.
 
@@ -33,6 +36,13 @@ class Socket:
 
         :param reconnect_socket: Переподключаться при потере соединения?
         :type reconnect_socket: :obj:`bool`
+
+        :param dispatcher: Пул потоков, в котором выполняются обработчики.
+        :type dispatcher: :obj:`Dispatcher`
+
+        :param deduplicator: Отсеивание повторно доставленных событий. Один экземпляр можно передать
+            нескольким вебсокетам одного аккаунта.
+        :type deduplicator: :obj:`EventDeduplicator`
         """
         self.token = token
         self.ERROR_HANDLERS = ERROR_HANDLERS or []
@@ -41,10 +51,16 @@ class Socket:
         self.NEW_EVENT_HANDLERS = NEW_EVENT_HANDLERS or []
 
         self.reconnect_socket = reconnect_socket
+        self.dispatcher = dispatcher or Dispatcher()
+        self.deduplicator = deduplicator
 
         self.first_msg = False  # Флаг, устанавливается на True, после получения первого сообщения
         self.channel: str | None = None  # Приватный канал, по которому будут идти запросы
 
+        self.backoff = Backoff()
+        self.recovery = Recovery()
+        self._stop_event = Event()
+
     def check_type_event(self, message: dict) -> EventTypes:
         """
         Определение типа события на основе сообщения из вебсокета.
@@ -57,7 +73,7 @@ class Socket:
         """
         return EventTypes.get_type_name(message)
 
-    def create_event(self, data: Dict[str, Any], event_type: EventTypes) -> events.BaseEvent:
+    def create_event(self, data: Dict[str, Any], event_type: EventTypes = None) -> events.BaseEvent:
         """
         Создание события на основе сообщения из вебсокета.
 
@@ -67,18 +83,23 @@ class Socket:
         :return: Событие.
         :rtype: :obj:`events.BaseEvent`
         """
+        return self._build_event(decode(data), event_type)
+
+    @staticmethod
+    def _build_event(frame: Frame, event_type: EventTypes = None) -> events.BaseEvent:
+        event_type = event_type or frame.type
         if event_type == EventTypes.CLIENT_CONNECTION:
-            return events.ClientConnectionEvent.from_json(data)
+            return events.ClientConnectionEvent.from_frame(frame)
         elif event_type == EventTypes.NEW_MESSAGE:
-            return events.NewMessageEvent.from_json(data)
+            return events.NewMessageEvent.from_frame(frame)
         elif event_type == EventTypes.CHAT_READ:
-            return events.ChatReadEvent.from_json(data)
-        elif event_type in (EventTypes.NEW_ORDER.value, EventTypes.ORDER_STATE.value):
-            return events.OrderStateChangeEvent.from_json(data)
+            return events.ChatReadEvent.from_frame(frame)
+        elif event_type in (EventTypes.NEW_ORDER, EventTypes.ORDER_STATE):
+            return events.OrderStateChangeEvent.from_frame(frame)
         elif event_type == EventTypes.NOTIFICATION:
-            return events.NotificationEvent.from_json(data)
+            return events.NotificationEvent.from_frame(frame)
         else:
-            return events.BaseEvent.from_json(data)
+            return events.BaseEvent.from_frame(frame)
 
     def on_message(self, ws, message):
         """
@@ -90,20 +111,34 @@ class Socket:
         :param message: Сообщение в формате JSON.
         :type message: :obj:`dict`
         """
-        msg_json = json.loads(message)
-        e_type = self.check_type_event(msg_json)
-        event = self.create_event(msg_json, EventTypes.get_type_name(msg_json))
-        if not self.first_msg and e_type == EventTypes.CLIENT_CONNECTION:
+        self._process_message(json.loads(message))
+
+    def _process_message(self, msg_json: Dict[str, Any]):
+        """
+        Обрабатывает разобранное сообщение вебсокета.
+        """
+        frame = decode(msg_json)
+        if not self.first_msg and frame.type == EventTypes.CLIENT_CONNECTION:
             self.first_msg = True
+            event = self._build_event(frame)
             for handler in self.OPEN_HANDLERS:
-                Thread(target=handler, args=(event,), daemon=True).start()
-            self.channel = event.channel
+                self.dispatcher.submit(handler, event)
+            self.channel = frame.channel
+            self.backoff.reset()
             # print(f"Websocket готов принимать события")
+            for recovered in self.recovery.on_connect(frame.data, frame.channel):
+                self._process_message(recovered)
+            return
+        if frame.channel != self.channel:
+            return
+        self.recovery.update(frame.offset)
+        if not self.NEW_EVENT_HANDLERS:
             return
-        if event.channel != self.channel:
+        event = self._build_event(frame)
+        if self.deduplicator and self.deduplicator.is_duplicate(event.event_type, event.event_id):
             return
         for handler in self.NEW_EVENT_HANDLERS:
-            Thread(target=handler, args=(event,), daemon=True).start()
+            self.dispatcher.submit(handler, event, key=event.partition_key)
 
     def on_error(self, ws, error):
         """
@@ -116,7 +151,7 @@ class Socket:
         :type error: :obj:`Exception`
         """
         for handler in self.ERROR_HANDLERS:
-            Thread(target=handler, args=(error,), daemon=True).start()
+            self.dispatcher.submit(handler, error)
 
     def on_close(self, ws, close_status_code, close_msg):
         """
@@ -132,11 +167,8 @@ class Socket:
         :type close_msg: :obj:`str`
         """
         for handler in self.CLOSE_HANDLERS:
-            Thread(target=handler, args=(close_status_code, close_msg), daemon=True).start()
+            self.dispatcher.submit(handler, close_status_code, close_msg)
         # print(f"Соединение закрыто: {close_status_code} - {close_msg}")
-        time.sleep(5)
-        if self.reconnect_socket:
-            self.run_websocket()
 
     def on_open(self, ws):
         """
@@ -146,23 +178,38 @@ class Socket:
         :type ws: :obj:`websocket.WebSocketApp`
         """
         auth_data = {
-            "params": {
-                "token": self.token
-            },
+            "params": self.recovery.connect_params(self.token),
             "id": 1
         }
         ws.send(json.dumps(auth_data))
 
     def run_websocket(self, **kwargs):
         """
-        Запуск WebSocket клиента.
-        """
-        self.ws = websocket.WebSocketApp(
-            "wss://ws.paygame.ru/connection/websocket",
-            on_message=self.on_message,
-            on_error=self.on_error,
-            on_close=self.on_close,
-            on_open=self.on_open,
-            **kwargs
-        )
-        self.ws.run_forever()
+        Запуск WebSocket клиента. При включенном переподключении переподключается
+        с экспоненциальной задержкой и восстановлением пропущенных событий.
+        """
+        import websocket
+
+        self._stop_event.clear()
+        while not self._stop_event.is_set():
+            self.first_msg = False
+            self.ws = websocket.WebSocketApp(
+                "wss://ws.paygame.ru/connection/websocket",
+                on_message=self.on_message,
+                on_error=self.on_error,
+                on_close=self.on_close,
+                on_open=self.on_open,
+                **kwargs
+            )
+            self.ws.run_forever()
+            if not self.reconnect_socket:
+                break
+            self._stop_event.wait(self.backoff.next())
+
+    def stop(self):
+        """
+        Останавливает WebSocket клиент и отключает переподключение.
+        """
+        self._stop_event.set()
+        if getattr(self, "ws", None):
+            self.ws.close()
@@ -0,0 +1,50 @@
+"""
+Время ``import PaygameAPI`` и проверка, что тяжелые зависимости не загружаются при импорте.
+
+Запуск: ``python benchmarks/import_time.py [количество запусков]``.
+Завершается с кодом 1, если при импорте загрузился один из модулей HEAVY_MODULES.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Загружаются только при первом использовании (сессия, вебсокет, парсинг страницы, AsyncBot, пулы потоков)
+HEAVY_MODULES = ("cloudscraper", "requests", "websocket", "bs4", "asyncio", "concurrent.futures")
+
+CHILD = f"""
+import sys, time
+started = time.perf_counter()
+import PaygameAPI
+elapsed = time.perf_counter() - started
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure() -> tuple:
+    # Каждый замер в отдельном процессе: иначе модули уже будут в sys.modules
+    output = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, check=True, capture_output=True,
+                            text=True).stdout.split()
+    return float(output[0]), output[1].split(",") if len(output) > 1 else []
+
+
+def main(runs: int = 10):
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        elapsed, modules = measure()
+        times.append(elapsed)
+        loaded.update(modules)
+    print(f"import PaygameAPI: медиана {statistics.median(times) * 1e3:.1f} мс, "
+          f"минимум {min(times) * 1e3:.1f} мс ({runs} запусков)")
+    if loaded:
+        print("Загружены при импорте: " + ", ".join(sorted(loaded)))
+        sys.exit(1)
+    print("Тяжелые зависимости при импорте не загружаются")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
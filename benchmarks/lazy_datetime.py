@@ -0,0 +1,72 @@
+"""
+Стоимость разбора больших ответов get_chats / get_notifications с ленивыми полями дат.
+
+Запуск: ``python benchmarks/lazy_datetime.py [количество записей]``.
+
+"лениво" - только разбор ответа, даты не читаются (типичный обработчик).
+"все даты" - разбор и чтение всех полей дат, то есть та же работа, что при немедленном
+преобразовании в datetime до перехода на ленивые поля.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PaygameAPI.common import converters  # noqa: E402
+
+DATE = "2024-05-01T12:00:00.123456+03:00"
+
+
+def user(user_id: int) -> dict:
+    return {"id": user_id, "username": f"user{user_id}", "avatar": None, "is_online": False,
+            "last_active": DATE, "date_joined": DATE, "rating": 4.9}
+
+
+def chats_payload(count: int) -> dict:
+    return {"count": count, "next": None, "previous": None, "results": [{
+        "id": i, "uid": str(i), "count": 10, "last_read": i, "users": [user(1), user(i + 2)],
+        "last_message": {"id": i, "sender": user(i + 2), "created_date": DATE, "text": "привет", "peer": i,
+                         "type": "message", "service_type": "", "removed": False, "media": []},
+    } for i in range(count)]}
+
+
+def notifications_payload(count: int) -> dict:
+    return {"next": None, "previous": None, "next_cursor": "c", "previous_cursor": None, "results": [{
+        "is_read": True, "created_date": DATE, "uuid_id": str(i), "verb": "order_new", "content_id": str(i),
+        "title": None, "date_of_reading": DATE, "meta": "",
+    } for i in range(count)]}
+
+
+def read_chat_dates(chats):
+    # Профили в ответе общие (identity map), поэтому каждая строка разбирается один раз
+    for chat in chats.results:
+        chat.last_message.created_date
+        for profile in (*chat.users, chat.last_message.sender):
+            profile.last_active, profile.date_joined
+
+
+def read_notification_dates(notifications):
+    for notification in notifications.results:
+        notification.created_date, notification.date_of_reading
+
+
+def best(func, repeat: int = 7) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(count: int = 5000):
+    cases = [
+        ("get_chats", converters.parse_chat_list, chats_payload(count), read_chat_dates),
+        ("get_notifications", converters.parse_notification_list, notifications_payload(count),
+         read_notification_dates),
+    ]
+    print(f"{'Ответ':<20}{'лениво, мс':>12}{'все даты, мс':>15}{'экономия':>10}  ({count} записей)")
+    for name, parse, payload, read_dates in cases:
+        lazy = best(lambda: parse(payload))
+        eager = best(lambda: read_dates(parse(payload)))
+        print(f"{name:<20}{lazy * 1e3:>12.2f}{eager * 1e3:>15.2f}{1 - lazy / eager:>10.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,56 @@
+"""
+Память на объект моделей из types.py: со __slots__ (как в библиотеке) и с обычным __dict__.
+
+Запуск: ``python benchmarks/model_memory.py [количество объектов]``.
+Значения полей общие для всех объектов, поэтому измеряется только накладной расход самих объектов.
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PaygameAPI.types import Chat, Message, Notification, OrderHistory, UserProfile  # noqa: E402
+
+DATE = "2024-05-01T12:00:00+03:00"
+
+# Модель -> аргументы конструктора
+MODELS = {
+    UserProfile: dict(username="seller", avatar=None, id=1, is_online=True, last_active=DATE, date_joined=DATE,
+                      rating=4.9),
+    Message: dict(id=1, sender=None, created_date=DATE, text="привет", chat_id=1, extra=None, media=[],
+                  type="message", service_type="", removed=False, distrust=None),
+    Chat: dict(id=1, count=1, users=[], uid="1", last_message=None, last_read=1),
+    Notification: dict(is_read=False, created_date=DATE, uuid_id="uuid", verb="order_new", content_id="1",
+                       title=None, date_of_reading=None, meta=""),
+    OrderHistory: dict(id=1, state="paid", created_date=DATE),
+}
+
+
+def without_slots(cls: type) -> type:
+    # Та же модель, но с __dict__ у каждого экземпляра: конструктор тот же, слотов и дескрипторов нет
+    return type(cls.__name__, (), {"__init__": cls.__init__})
+
+
+def bytes_per_object(cls: type, kwargs: dict, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(**kwargs) for _ in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    # Без учета самого списка
+    return (used - sys.getsizeof([None] * count)) / count
+
+
+def main(count: int = 100_000):
+    print(f"{'Модель':<14}{'__dict__, Б':>13}{'__slots__, Б':>14}{'объектов/МБ':>22}{'экономия':>10}")
+    for cls, kwargs in MODELS.items():
+        plain = bytes_per_object(without_slots(cls), kwargs, count)
+        slotted = bytes_per_object(cls, kwargs, count)
+        per_mb = f"{2 ** 20 / plain:,.0f} -> {2 ** 20 / slotted:,.0f}"
+        print(f"{cls.__name__:<14}{plain:>13.0f}{slotted:>14.0f}{per_mb:>22}{1 - slotted / plain:>10.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)